@@ -1,17 +1,41 @@
+import collections
+import contextvars
+import copy
 import importlib
+import inspect
+import itertools
 import json
 import os
 import pkgutil
+import queue
 import re
-from datetime import datetime
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from concurrent.futures import wait
+from datetime import datetime, timedelta
 
 import tiktoken
 from colorama import Fore, Style, init
 from dotenv import load_dotenv
-from openai import AzureOpenAI
+from openai import APIConnectionError, APITimeoutError, AzureOpenAI, InternalServerError, RateLimitError
 
-from tools.base_tool import BaseTool
+from tools.base_tool import BaseTool, load_manifest
+from tools.lazy_tool import LazyTool
+from utils.answer_cache import AnswerCache
+from utils.budget import QueryBudget
+from utils.cache import ToolCache
+from utils.events import AgentEvent
+from utils.http import HttpTransport
 from utils.message import Message
+from utils.observation import ObservationCompressor
+from utils.rate_limiter import RateLimiter, RateLimitTimeout, retry_after_seconds
+from utils.router import QueryRouter
+from utils.session_store import open_session_store
+from utils.tokenizer import ApproximateTokenizer
+from utils.tool_schema import tool_input, validate
+from utils.tracing import JsonlSink, MetricsRegistry, Tracer
 
 
 class ReActAgent:
@@ -19,33 +43,164 @@ class ReActAgent:
         load_dotenv()
 
         self.tools = {}
-        self.messages = []
         self.max_iterations = 10
-        self.current_iteration = 0
-        self.old_chats_summary = ""
+        self.query_deadline = None
+        self.max_query_tokens = None
+        self.max_tool_calls = None
         self.messages_to_summarize = 3
         self.llm_max_tokens = 500
         self.max_messages_tokens = 1000
+        self.max_observation_tokens = 400
+        self.stream = False
+        self.stop_sequences = ["PAUSE", "Observation:"]
+        self.parallel_actions = False
+        self.function_calling = False
+        self.max_workers = 4
+        self.shared_workers = int(os.getenv("AGENT_WORKERS", 32))
+        self.executor = ThreadPoolExecutor(max_workers=self.shared_workers)
+        self.tool_cache = ToolCache(max_entries=256, db_path=os.getenv("TOOL_CACHE_DB"))
+        self.answer_cache = AnswerCache(max_entries=1024, similarity=float(os.getenv("ANSWER_CACHE_SIMILARITY", 0)) or None)
+        self.answer_cache_ttl = 24 * 60 * 60
+        self.router = QueryRouter()
+        self.session_store = open_session_store(os.getenv("SESSION_STORE"))
+        self.sessions = collections.OrderedDict()
+        self.sessions_lock = threading.Lock()
+        self.max_resident_sessions = 256
+        self.session_idle_timeout = 15 * 60
+        self.history_limit = 50
+        self.http = HttpTransport(max_connections_per_host=int(os.getenv("HTTP_MAX_CONNECTIONS_PER_HOST", 20)), retries=2, timeout=5.0)
+        self.verbose = True
+        self.tracer = Tracer(MetricsRegistry(), sinks=[JsonlSink(os.getenv("TRACE_FILE"))] if os.getenv("TRACE_FILE") else [])
+        self.llm_retries = 3
+        self.rate_limiter = RateLimiter(tokens_per_minute=int(os.getenv("LLM_TOKENS_PER_MINUTE", 0)) or None, requests_per_minute=int(os.getenv("LLM_REQUESTS_PER_MINUTE", 0)) or None)
         self.model = os.getenv("MODEL_NAME")
         self.client = self.get_llm_client()
         self.system_prompt = self.load_prompt("prompts/system_prompt.txt")
         self.summary_prompt = self.load_prompt("prompts/summary_prompt.txt")
-        self.tokenizer = tiktoken.encoding_for_model(self.model)
+        self.parallel_prompt = self.load_prompt("prompts/parallel_prompt.txt")
+        self.function_prompt = self.load_prompt("prompts/function_prompt.txt")
+        self.final_answer_prompt = self.load_prompt("prompts/final_answer_prompt.txt")
+        self.context_prompt = self.load_prompt("prompts/context_prompt.txt")
+        self.prompt_cache = {}
+        self._tokenizer = None
+        self.observation_compressor = ObservationCompressor(self.num_tokens_from_text)
+        self.reset_conversation()
 
-        # Register tools dynamically
+        # Register tools from the manifest, they are imported on first use
         self.register_tools()
 
+    def reset_conversation(self):
+        """Initializes the per-conversation state; everything else on the agent can be shared between conversations."""
+        self.messages = []
+        self.messages_tokens = 0
+        self.session_id = None
+        self.history_loaded = True
+        self.budget = QueryBudget()
+        self.current_iteration = 0
+        self.old_chats_summary = ""
+        self.pending_summary = None
+        self.pending_action = None
+        self.tool_calls = []
+        self.call_ids = {}
+        self.observation_sources = {}
+        self.tools_used = set()
+        self.stop_reason = None
+        self.usage_totals = {"prompt_tokens": 0, "completion_tokens": 0, "cached_tokens": 0}
+        self.on_event = None
+
+    def new_session(self):
+        """Returns a lightweight agent for a new conversation that shares this agent's client, tokenizer, tools, caches and pools."""
+        self.tokenizer  # Load once here so sessions don't each load their own copy
+        session = copy.copy(self)
+        session.reset_conversation()
+
+        return session
+
+    def get_session(self, session_id):
+        """Returns the session for session_id, recreating it from the session store if it was evicted or the process restarted.
+
+        Its history is loaded lazily on the next query, and sessions idle for longer than session_idle_timeout are evicted from memory.
+        """
+        with self.sessions_lock:
+            session, _ = self.sessions.pop(session_id, (None, None))
+
+            if session is None:
+                session = self.new_session()
+                session.session_id = session_id
+                session.history_loaded = self.session_store is None
+
+            self.sessions[session_id] = (session, time.monotonic())
+            self.evict_idle_sessions()
+
+        return session
+
+    def evict_idle_sessions(self):
+        """Drop idle and least recently used sessions from memory, their messages are already in the session store. Caller must hold the sessions lock."""
+        if self.session_store is None:
+            # Without a store an evicted conversation would be lost, only the resident limit applies
+            while len(self.sessions) > self.max_resident_sessions:
+                self.sessions.popitem(last=False)
+            return
+
+        now = time.monotonic()
+        while self.sessions:
+            _, last_used = next(iter(self.sessions.values()))
+            if len(self.sessions) <= self.max_resident_sessions and now - last_used < self.session_idle_timeout:
+                break
+            session_id, _ = self.sessions.popitem(last=False)
+            self.session_store.forget(session_id)
+
+    def load_history(self):
+        """Loads the summary and most recent messages of a session from the session store on its first query."""
+        if self.history_loaded:
+            return
+
+        self.history_loaded = True
+        self.old_chats_summary, rows = self.session_store.load(self.session_id, self.history_limit)
+        self.messages = [Message(role, content, tokens, message_id) for message_id, role, content, tokens in rows]
+        self.messages_tokens = self.num_tokens_from_messages(self.messages)
+
+    @property
+    def tokenizer(self):
+        """The tokenizer, loaded on first use to keep startup fast."""
+        if self._tokenizer is None:
+            self._tokenizer = self.load_tokenizer()
+        return self._tokenizer
+
+    def load_tokenizer(self):
+        """Loads the tiktoken encoding from the local BPE cache, falling back to an approximate tokenizer when offline."""
+        os.environ.setdefault("TIKTOKEN_CACHE_DIR", os.path.join(".cache", "tiktoken"))
+
+        try:
+            try:
+                return tiktoken.encoding_for_model(self.model)
+            except KeyError:
+                # Azure deployment names are not model names
+                return tiktoken.get_encoding("o200k_base")
+        except Exception as e:
+            self.log(f"{Fore.YELLOW}Tokenizer unavailable ({e}), using approximate token counts.{Style.RESET_ALL}")
+            return ApproximateTokenizer()
+
     def get_llm_client(self):
         llm_client = AzureOpenAI(
             api_key=os.getenv("AZURE_OPENAI_API_KEY"),
             api_version=os.getenv("OPENAI_API_VERSION"),
             azure_endpoint=os.getenv("AZURE_OPENAI_ENDPOINT"),
+            max_retries=0,  # Retries go through the shared rate limiter in create_completion
         )
         return llm_client
 
     def register_tools(self):
-        """Dynamically registers all available tools."""
-        tool_modules = [name for _, name, _ in pkgutil.iter_modules(["tools"])]
+        """Registers the tools listed in the manifest without importing them, then dynamically registers any other tool modules."""
+        self.prompt_cache = {}
+
+        manifest = load_manifest()
+
+        for entry in manifest:
+            self.tools[entry["name"].lower()] = LazyTool(entry["name"], entry["description"], entry["module"], entry["class"], entry.get("cache_ttl", 0), entry.get("observation_tokens"), entry.get("parameters"), factory=self.create_tool, log=self.log)
+
+        listed_modules = {entry["module"] for entry in manifest} | {"tools.base_tool", "tools.lazy_tool"}
+        tool_modules = [name for _, name, _ in pkgutil.iter_modules(["tools"]) if f"tools.{name}" not in listed_modules]
 
         for module_name in tool_modules:
             try:
@@ -53,21 +208,41 @@ class ReActAgent:
                 for attr_name in dir(module):
                     attr = getattr(module, attr_name)
                     if isinstance(attr, type) and issubclass(attr, BaseTool) and attr is not BaseTool:
-                        tool_instance = attr()
+                        tool_instance = self.create_tool(attr)
                         self.tools[tool_instance.name.lower()] = tool_instance
             except Exception as e:
-                print(f"\n{Fore.RED}[ERROR] Failed to register tool {module_name}: {e}{Style.RESET_ALL}\n")
+                self.log(f"\n{Fore.RED}[ERROR] Failed to register tool {module_name}: {e}{Style.RESET_ALL}\n")
+
+    def create_tool(self, tool_class):
+        """Creates a tool instance, giving network tools the agent's pooled HTTP transport and tools that report problems the agent's logger."""
+        parameters = inspect.signature(tool_class).parameters
+        shared = {"http": self.http, "log": self.log}
+
+        return tool_class(**{name: value for name, value in shared.items() if name in parameters})
+
+    def log(self, message):
+        """Print a message to the console unless verbose output is switched off."""
+        if self.verbose:
+            print(message)
+
+    def submit(self, fn, *args):
+        """Run a function on the worker pool inside the current trace, so its spans nest under the calling span."""
+        return self.executor.submit(contextvars.copy_context().run, fn, *args)
 
     def get_tools(self):
         """Returns a formatted string listing available tools."""
         return "\n".join([f"{tool.name}: {tool.description}" for tool in self.tools.values()])
 
-    def num_tokens_from_messages(self, messages):
-        """Return the number of tokens used by a list of messages"""
-        value = "".join([msg["content"] for msg in messages])  # Extract content from chat messages
-        encoded = self.tokenizer.encode(value)  # Tokenize the extracted text
+    def tool_definitions(self):
+        """Returns the tools as function definitions for the API, built once like the system prompt."""
+        if "tools" not in self.prompt_cache:
+            self.prompt_cache["tools"] = [{"type": "function", "function": {"name": tool.name, "description": tool.description, "parameters": tool.parameters}} for tool in self.tools.values()]
 
-        return len(encoded)
+        return self.prompt_cache["tools"]
+
+    def num_tokens_from_messages(self, messages):
+        """Return the number of tokens used by a list of messages, using their cached token counts"""
+        return sum(message.tokens for message in messages)
 
     def num_tokens_from_text(self, text):
         """Return the number of tokens used by the given text."""
@@ -80,174 +255,931 @@ class ReActAgent:
         with open(path, "r") as file:
             return file.read() if file else ""
 
-    def add_message(self, role, content):
-        """Add a message to the messages list."""
-        self.messages.append(Message(role=role, content=content))
+    def add_message(self, role, content, tool_calls=None, tool_call_id=None):
+        """Add a message to the messages list, update the running token total and emit its events."""
+        message = Message(role=role, content=content, tokens=self.num_tokens_from_text(content), tool_calls=tool_calls, tool_call_id=tool_call_id)
+        if self.session_store and self.session_id:
+            self.persist(self.store_message, message)
+        self.messages.append(message)
+        self.messages_tokens += message.tokens
+
+        if role == "assistant":
+            self.emit_response(content)
+        elif role == "system":
+            self.emit("observation", content)
+
+    def emit(self, event_type, content, **data):
+        """Send a structured event to the callback of the running query, if any."""
+        if self.on_event:
+            self.on_event(AgentEvent(event_type, content, data))
+
+    def emit_response(self, response):
+        """Split an assistant response into thought, action and final answer events."""
+        if not self.on_event:
+            return
+
+        has_markers = re.search(r"^(Thought|Action(\s+\d+)?|Final Answer):", response, flags=re.MULTILINE)
+        event_type = "thought" if has_markers else "final_answer"
+        lines = []
+
+        for line in response.split("\n") + ["PAUSE"]:
+            match = re.match(r"(Thought|Action(?:\s+\d+)?|Final Answer):\s*(.*)", line.strip())
+
+            if not match and line.strip() != "PAUSE":
+                lines.append(line)
+                continue
+
+            # A new section starts, emit the previous one
+            content = "\n".join(lines).strip()
+            if content:
+                self.emit(event_type, content, reasoning=bool(has_markers))
+
+            lines = [match.group(2)] if match else []
+            if match:
+                event_type = "thought" if match.group(1) == "Thought" else "final_answer" if match.group(1) == "Final Answer" else "action"
+
+    def delete_messages(self, start_index, end_index):
+        """Delete a slice of the messages list and update the running token total."""
+        self.messages_tokens -= self.num_tokens_from_messages(self.messages[start_index:end_index])
+        if self.session_store and self.session_id:
+            self.persist(self.unstore_messages, self.messages[start_index:end_index])
+        del self.messages[start_index:end_index]
+
+    def persist(self, write, *args):
+        """Run a session store write; the async agent queues it instead, so store I/O stays off the event loop."""
+        write(*args)
+
+    def store_message(self, message):
+        message.id = self.session_store.append(self.session_id, message.role, message.content, message.tokens)
+
+    def unstore_messages(self, messages):
+        # Read the IDs only now, a queued write may just have assigned them
+        self.session_store.delete(self.session_id, [message.id for message in messages if message.id is not None])
+
+    def run_loop(self):
+        """Run the Thought-Action loop as a state machine until a final answer or an exhausted budget, tracing each iteration."""
+        state, payload = "think", None
+
+        while state != "done":
+            with self.tracer.span("iteration", iteration=self.current_iteration + 1):
+                state, payload = self.step(state, payload)
+                while state in ("act", "plan"):
+                    state, payload = self.step(state, payload)
+
+    def step(self, state, payload):
+        """Run one state of the loop and return the next (state, payload)."""
+        reason = self.budget_stop_reason(state)
+        if reason:
+            self.force_final_answer(reason)
+            return "done", None
+
+        try:
+            if state == "think":
+                return self.think()
+            if state == "act":
+                return self.execute_action(*payload)
+            return self.execute_plan(payload)
+        except (APITimeoutError, RateLimitTimeout):
+            self.force_final_answer("deadline")
+            return "done", None
+
+    def budget_stop_reason(self, state):
+        """Return why the loop must stop before entering the given state, or None to continue."""
+        reason = self.budget.exhausted()
+
+        # Without tool calls left the model may still answer from what it has
+        if reason == "tool_calls" and state == "think":
+            reason = None
+
+        if reason is None and state == "think" and self.current_iteration >= self.max_iterations:
+            reason = "iterations"
+
+        return reason
 
     def think(self):
-        """Think and decide based on the response from OpenAI."""
+        """Think and decide on the next state based on the response from OpenAI."""
+        response = self.get_llm_response(self.start_iteration())
+
+        return self.process_response(response)
+
+    def start_iteration(self):
+        """Count a new iteration and return its prompt."""
         self.current_iteration += 1
+        self.pending_action = None
+        self.call_ids = {}
 
-        if self.current_iteration > self.max_iterations:
-            print(f"\n{Fore.YELLOW}Reached maximum iterations. Stopping.{Style.RESET_ALL}")
-            self.add_message(
-                "assistant",
-                "I'm sorry, but I couldn't find a satisfactory answer within the allowed number of iterations.",
-            )
-            return
+        return self.build_prompt()
 
-        current_date = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        prompt = self.system_prompt.format(tools=self.get_tools(), date=current_date)
+    def process_response(self, response):
+        """Record a response in the history and decide on the next state, reporting tool calls with invalid arguments back to the model."""
+        response, tool_calls, errors = self.apply_tool_calls(response)
 
-        response = self.get_llm_response(prompt)
-        self.add_message("assistant", response)
+        if response or tool_calls:
+            self.add_message("assistant", response, tool_calls=tool_calls)
 
-        # Print each thought immediately
-        self.format_output(response)
+            # Print each thought immediately
+            self.format_output(response)
 
-        # Continue processing actions
-        self.determine_action(response)
+        if errors:
+            # Each invalid call gets its own observation, the API expects an answer to every call
+            for call_id, error in errors:
+                self.add_message("system", f"Observation: {error}", tool_call_id=call_id)
+            observation = "\n".join(f"Observation: {error}" for _, error in errors)
+            self.log(f"{Fore.RED}\n[SYSTEM]:{Style.RESET_ALL} {observation}\n")
 
-    def determine_action(self, response):
-        """Decide on the next action based on the response, without using regex."""
+            # Let the model correct its arguments unless it also made valid calls or answered
+            if "Final Answer:" not in response and not self.find_action_lines(response):
+                return "think", None
 
-        if "Final Answer:" in response:
-            return
+        return self.determine_action(response)
 
-        # Find "Action:" in the response
-        action_start = response.find("Action:")
+    def force_final_answer(self, reason):
+        """Degrade gracefully when a budget runs out by asking for a Final Answer without further actions."""
+        response = None
 
-        if action_start == -1:
-            print(f"{Fore.YELLOW}No action or final answer found in the response.{Style.RESET_ALL}")
-            return
+        if self.stop_query(reason):
+            try:
+                response = self.get_llm_response(self.build_prompt(), instruction=self.final_answer_prompt)
+            except Exception as e:
+                self.log(f"{Fore.RED}Error: Failed to force a final answer: {e}{Style.RESET_ALL}")
+
+        self.add_forced_answer(reason, response)
+
+    def stop_query(self, reason):
+        """Record why the query stops and return True if the model may still be asked for a final answer from what it has."""
+        self.stop_reason = reason
+        self.log(f"\n{Fore.YELLOW}Query budget exhausted ({reason}). Stopping.{Style.RESET_ALL}")
+
+        return reason not in ("iterations", "deadline")
+
+    def add_forced_answer(self, reason, response):
+        """Add the forced final answer, or an apology when the model gave none."""
+        if response and "Final Answer:" in response:
+            self.add_message("assistant", response)
+            self.format_output(response)
+        elif reason == "iterations":
+            self.add_message("assistant", "I'm sorry, but I couldn't find a satisfactory answer within the allowed number of iterations.")
+        else:
+            self.add_message("assistant", "I'm sorry, but I couldn't find a satisfactory answer within the allowed time and resources.")
+
+    def build_prompt(self):
+        """Return the static system prompt, built once so that the prompt prefix is identical on every call."""
+        # The tools reach the model as function definitions in function-calling mode
+        key = "function" if self.function_calling else self.parallel_actions
 
-        # Extract the action line
-        action_line = response[action_start:].split("\n")[0].strip()
+        if key not in self.prompt_cache:
+            if self.function_calling:
+                prompt = self.function_prompt
+            else:
+                prompt = self.system_prompt.format(tools=self.get_tools())
 
+            if self.parallel_actions and not self.function_calling:
+                prompt += f"\n\n{self.parallel_prompt}"
+
+            self.prompt_cache[key] = prompt
+
+        return self.prompt_cache[key]
+
+    def build_context(self):
+        """Return the volatile context that follows the static prefix: today's date and the old messages summary."""
+        context = self.context_prompt.format(date=datetime.now().strftime("%Y-%m-%d"))
+
+        if self.old_chats_summary:
+            context += f"\nOld messages summary:\n{self.old_chats_summary}"
+
+        return context
+
+    def build_messages(self, prompt, instruction=None):
+        """Assemble the request messages, stable prefix first: system prompt, context, chat history, then any one-off instruction."""
+        messages = [{"role": "system", "content": prompt}, {"role": "system", "content": self.build_context()}]
+        messages += self.history_messages()
+
+        if instruction:
+            messages.append({"role": "system", "content": instruction})
+
+        return messages
+
+    def history_messages(self):
+        """Return the chat history as request messages, one per message.
+
+        In function-calling mode an assistant turn whose calls are all answered by the observations right after it is sent as an
+        assistant tool_calls message followed by tool messages. Any other turn, e.g. one the budget stopped before its calls ran,
+        or one loaded from the session store, keeps the text form.
+        """
+        messages = []
+        answered = set()
+
+        for index, message in enumerate(self.messages):
+            if message.tool_calls and self.function_calling:
+                replies = itertools.takewhile(lambda reply: reply.tool_call_id, self.messages[index + 1 :])
+                answered = {reply.tool_call_id for reply in replies}
+                call_ids = {call["id"] for call in message.tool_calls}
+
+                if call_ids <= answered:
+                    answered = call_ids
+                    content = "\n".join(line for line in message.content.split("\n") if not re.match(r"(Action(\s+\d+)?:|PAUSE$)", line.strip())).strip()
+                    messages.append({"role": "assistant", "content": content or None, "tool_calls": message.tool_calls})
+                    continue
+
+                answered = set()
+            elif message.tool_call_id in answered:
+                messages.append({"role": "tool", "tool_call_id": message.tool_call_id, "content": message.content})
+                continue
+            elif not message.tool_call_id:
+                answered = set()
+
+            messages.append({"role": message.role, "content": message.content})
+
+        return messages
+
+    def parse_action_line(self, action_line):
+        """Parse an 'Action: <tool>: <query>' line into a (tool_name, query) tuple, raising ValueError if it is malformed."""
         # Remove the "Action:" prefix
         action_parts = action_line.replace("Action:", "").strip().split(":", 1)
 
         if len(action_parts) < 2:
-            print(f"{Fore.RED}Error: Action format is incorrect: {action_line}{Style.RESET_ALL}")
-            return
+            raise ValueError(f"Action format is incorrect: {action_line}")
 
         tool_name = action_parts[0].strip().lower()
         query = action_parts[1].strip()
 
-        # Handle calculator JSON validation
-        if tool_name == "calculator":
+        if not query:
+            raise ValueError(f"Action has no input: {action_line}")
+
+        return tool_name, query
+
+    def find_action_lines(self, response):
+        """Return the "Action:" lines of a response, skipping empty "Action:" headers."""
+        action_lines = [line.strip() for line in response.split("\n") if re.match(r"Action(\s+\d+)?:", line.strip())]
+
+        return [line for line in action_lines if line != "Action:"] or action_lines
+
+    def parse_tool_call(self, name, arguments):
+        """Validate a structured tool call and return it as a (tool_name, query) tuple, raising ValueError if it cannot be dispatched."""
+        tool_name = name.strip().lower()
+        tool = self.tools.get(tool_name)
+        if not tool:
+            raise ValueError(f"Tool '{name}' not found")
+
+        try:
+            arguments = json.loads(arguments or "{}")
+        except ValueError:
+            raise ValueError(f"Arguments of {tool_name} are not valid JSON: {arguments}")
+
+        problems = validate(arguments, tool.parameters)
+        if problems:
+            raise ValueError(f"Invalid arguments for {tool_name}: {'; '.join(problems)}")
+
+        return tool_name, tool_input(arguments)
+
+    def apply_tool_calls(self, response):
+        """Write the structured tool calls of the last response as Action lines, so the history keeps the ReAct format.
+
+        Returns the response, the calls in the API's format for the history, and the (call id, error) pairs of the calls that
+        failed validation, which are never dispatched. The action ids of the valid calls map to their call ids in call_ids.
+        """
+        tool_calls, self.tool_calls = self.tool_calls, []
+        actions, errors = [], []
+
+        for call_id, name, arguments in tool_calls:
             try:
-                json_data = json.loads(query)
+                actions.append(self.parse_tool_call(name, arguments))
+                self.call_ids[len(actions)] = call_id
+            except ValueError as e:
+                errors.append((call_id, f"Error: {e}"))
 
-                if "operation" not in json_data:
-                    print(f"{Fore.RED}Error: Missing 'operation' in calculator JSON: {query}{Style.RESET_ALL}")
-                    return
+        if errors:
+            self.tracer.metrics.increment("tool_call_errors_total", len(errors))
 
-                query = json.dumps(json_data)
+        if len(actions) == 1:
+            action_lines = [f"Action: {actions[0][0]}: {actions[0][1]}"]
+        else:
+            action_lines = [f"Action {action_id}: {tool_name}: {query}" for action_id, (tool_name, query) in enumerate(actions, start=1)]
 
-            except json.JSONDecodeError:
-                print(f"{Fore.RED}Error: Invalid JSON input for calculator: {query}{Style.RESET_ALL}")
-                return
+        if action_lines:
+            response = "\n".join([re.sub(r"PAUSE$", "", response).strip()] + action_lines + ["PAUSE"]).strip()
+
+        native_calls = [{"id": call_id, "type": "function", "function": {"name": name, "arguments": arguments}} for call_id, name, arguments in tool_calls]
+
+        return response, native_calls or None, errors
+
+    def determine_action(self, response):
+        """Decide on the next state based on the response: "done", "act" on a single action or run a "plan"."""
+
+        if "Final Answer:" in response:
+            return "done", None
 
-        # Execute the extracted action
-        self.execute_action(tool_name, query)
+        action_lines = self.find_action_lines(response)
+
+        if not action_lines:
+            self.log(f"{Fore.YELLOW}No action or final answer found in the response.{Style.RESET_ALL}")
+            return "done", None
+
+        if (self.parallel_actions or self.function_calling) and (len(action_lines) > 1 or not action_lines[0].startswith("Action:")):
+            return "plan", action_lines
+
+        try:
+            tool_name, query = self.parse_action_line(action_lines[0])
+        except ValueError as e:
+            self.log(f"{Fore.RED}Error: {e}{Style.RESET_ALL}")
+            return "done", None
+
+        return "act", (tool_name, query)
 
     def execute_action(self, tool_name, query):
-        """Act on the response by calling the appropriate tool."""
+        """Act on the response by calling the appropriate tool, then go back to thinking."""
         tool = self.tools.get(tool_name)
 
         if tool:
-            result = tool.run(query)
-            observation = f"Observation: {tool_name} tool output: {result}"
+            self.budget.add_tool_calls()
+            return self.add_observation(tool_name, query, self.get_action_result(tool, query))
 
-            self.add_message("system", observation)
+        return self.tool_not_found(tool_name)
+
+    def tool_not_found(self, tool_name):
+        """Report an action naming an unknown tool to the model and go back to thinking."""
+        error_msg = f"Error: Tool '{tool_name}' not found"
+        self.log(f"\n{Fore.RED}{error_msg}{Style.RESET_ALL}")
+        self.add_message("system", error_msg)
+
+        return "think", None
+
+    def add_observation(self, tool_name, query, result):
+        """Add the observation of a single action and go back to thinking."""
+        observation = f"Observation: {tool_name} tool output: {self.format_observation(tool_name, query, result)}"
+
+        self.add_message("system", observation, tool_call_id=self.call_ids.pop(1, None))
+
+        # Print the observation immediately
+        self.log(f"{Fore.CYAN}\n[SYSTEM]:{Style.RESET_ALL} {observation}\n")
+
+        return "think", None
+
+    def parse_plan(self, action_lines):
+        """Parse numbered action lines into a plan of {action_id: (tool_name, query, dependencies)}."""
+        plan = {}
+
+        for position, action_line in enumerate(action_lines, start=1):
+            match = re.match(r"Action(?:\s+(\d+))?:(.*)", action_line)
+            action_id = int(match.group(1)) if match.group(1) else position
+
+            try:
+                tool_name, query = self.parse_action_line(f"Action:{match.group(2)}")
+            except ValueError as e:
+                self.log(f"{Fore.RED}Error: {e}{Style.RESET_ALL}")
+                continue
+
+            # Calls made in the same turn are independent in function-calling mode
+            dependencies = set() if self.function_calling else {int(ref) for ref in re.findall(r"#(\d+)", query)} - {action_id}
+            plan[action_id] = (tool_name, query, dependencies)
+
+        return plan
 
-            # Print the observation immediately
-            print(f"{Fore.CYAN}\n[SYSTEM]:{Style.RESET_ALL} {observation}\n")
+    def resolve_dependencies(self, query, results):
+        """Replace #<id> references in a query with the outputs of the finished actions."""
 
-            # Continue thinking after receiving observation
-            self.think()
+        def to_json(match):
+            result = str(results[int(match.group(1))]).strip()
+            try:
+                number = float(result)
+                return json.dumps(int(number) if number.is_integer() else number)
+            except ValueError:
+                return json.dumps(result)
+
+        query = re.sub(r'"#(\d+)"', lambda m: to_json(m) if int(m.group(1)) in results else m.group(0), query)
+        return re.sub(r"#(\d+)", lambda m: str(results[int(m.group(1))]) if int(m.group(1)) in results else m.group(0), query)
+
+    def ready_actions(self, plan, results):
+        """Remove and yield (action_id, tool, query) for every planned action whose dependencies have finished, counting it as a tool call.
+
+        An action is skipped instead, with the reason as its result, when one of its dependencies failed or the query budget is exhausted.
+        """
+        for action_id, (tool_name, query, dependencies) in list(plan.items()):
+            if dependencies - results.keys():
+                continue
+
+            del plan[action_id]
+            tool = self.tools.get(tool_name)
+            failed = sorted(dependency for dependency in dependencies if self.action_failed(results[dependency]))
+            exhausted = self.budget.exhausted()
+
+            if not tool:
+                results[action_id] = f"Error: Tool '{tool_name}' not found"
+            elif failed:
+                # An error substituted into the input would only produce another error
+                results[action_id] = f"Skipped: depends on failed action {', '.join(f'#{dependency}' for dependency in failed)}"
+            elif exhausted:
+                results[action_id] = f"Skipped: {'tool-call budget' if exhausted == 'tool_calls' else exhausted} exhausted"
+            else:
+                self.budget.add_tool_calls()
+                yield action_id, tool, self.resolve_dependencies(query, results)
+
+    @staticmethod
+    def action_failed(result):
+        """Return True for the result of a planned action that failed or was skipped."""
+        return ToolCache.is_error(result) or str(result).startswith("Skipped")
+
+    def plan_observations(self, actions, results):
+        """Return the observation of each action of a plan, {action_id: observation} ordered by action id."""
+        observations = {}
+
+        for action_id in sorted(results):
+            tool_name, query = actions[action_id]
+            output = self.format_observation(tool_name, query, results[action_id], pending=list(observations.values()))
+            observations[action_id] = f"Observation: [{action_id}] {tool_name} tool output: {output}"
+
+        return observations
+
+    def format_observation(self, tool_name, query, result, pending=()):
+        """Return a tool result as compact text within the tool's token budget, or a reference to an identical observation still in the history."""
+        tool = self.tools.get(tool_name)
+        max_tokens = tool.observation_tokens if tool and tool.observation_tokens is not None else self.max_observation_tokens
+
+        # Rank sentences by their relevance to both the tool query and the user's question
+        question = next((message.content for message in reversed(self.messages) if message.role == "user"), "")
+        text, saved_tokens = self.observation_compressor.compress_counted(result, query, max_tokens, question)
+
+        source = self.observation_sources.get(text)
+        reference = f"same as the earlier {source[0]} output for '{source[1]}'" if source else None
+
+        # Only point back to an observation the model can still see, summarization may have removed it
+        if reference and len(reference) < len(text) and any(text in content for content in list(pending) + [message.content for message in self.messages]):
+            text = reference
         else:
-            error_msg = f"Error: Tool '{tool_name}' not found"
-            print(f"\n{Fore.RED}{error_msg}{Style.RESET_ALL}")
-            self.add_message("system", error_msg)
-            self.think()  # Continue processing other actions
+            self.observation_sources[text] = (tool_name, query)
+
+        self.tracer.metrics.increment("observation_tokens_saved_total", saved_tokens)
+
+        return text
+
+    def execute_plan(self, action_lines):
+        """Run a plan of actions on the worker pool, starting each one as soon as its dependencies have finished."""
+        plan = self.parse_plan(action_lines)
+        actions = {action_id: (tool_name, query) for action_id, (tool_name, query, _) in plan.items()}
+        results = {}
+        running = {}
+
+        while plan or running:
+            # Start the actions whose dependencies are satisfied, at most max_workers of this conversation's at a time
+            for action_id, tool, query in itertools.islice(self.ready_actions(plan, results), self.max_workers - len(running)):
+                running[self.submit(self.run_tool, tool, query)] = action_id
+
+            if not running:
+                self.fail_unresolved(plan, results)
+                break
+
+            done, _ = wait(running, timeout=self.budget.remaining_time(), return_when=FIRST_COMPLETED)
+
+            if not done:
+                # Deadline reached, leave the remaining actions running in the background
+                self.fail_timed_out(plan, running, results)
+                break
+
+            self.collect_results(done, running, results)
+
+        return self.add_plan_observation(actions, results)
+
+    def fail_unresolved(self, plan, results):
+        """Fail the remaining actions, which depend on missing actions or on each other."""
+        for action_id in plan:
+            results[action_id] = f"Error: Unresolved dependencies {sorted(plan[action_id][2] - results.keys())}"
+
+    def fail_timed_out(self, plan, running, results):
+        """Fail the running and remaining actions once the deadline is reached."""
+        for action_id in list(running.values()) + list(plan):
+            results[action_id] = "Error: Tool call timed out"
+
+    def collect_results(self, done, running, results):
+        """Record the results of the finished futures or tasks of a plan."""
+        for future in done:
+            action_id = running.pop(future)
+            try:
+                results[action_id] = future.result()
+            except Exception as e:
+                results[action_id] = f"Error: {e}"
+
+    def add_plan_observation(self, actions, results):
+        """Add the combined observation of a plan and go back to thinking, or one observation per call in function-calling mode."""
+        observations = self.plan_observations(actions, results)
+        observation = "\n".join(observations.values())
+
+        if self.call_ids:
+            for action_id, content in observations.items():
+                self.add_message("system", content, tool_call_id=self.call_ids.pop(action_id, None))
+        else:
+            self.add_message("system", observation)
+
+        # Print the observations immediately
+        self.log(f"{Fore.CYAN}\n[SYSTEM]:{Style.RESET_ALL} {observation}\n")
+
+        return "think", None
+
+    def dispatch_action(self, action_line):
+        """Start a tool call in the background as soon as its action line has been streamed."""
+        try:
+            tool_name, query = self.parse_action_line(action_line)
+        except ValueError:
+            return
+
+        tool = self.tools.get(tool_name)
+        if tool:
+            self.pending_action = (tool_name, query, self.submit(self.run_tool, tool, query))
+
+    def get_action_result(self, tool, query):
+        """Return the tool output within the deadline, reusing the result of an action dispatched while streaming."""
+        future = self.take_pending_action(tool, query)
+        remaining_time = self.budget.remaining_time()
+
+        if future is None and remaining_time is None:
+            return self.run_tool(tool, query)
+        if future is None:
+            future = self.submit(self.run_tool, tool, query)
+
+        try:
+            return future.result(timeout=remaining_time)
+        except FutureTimeoutError:
+            return "Error: Tool call timed out"
+
+    def take_pending_action(self, tool, query):
+        """Return the future of the action dispatched while streaming if it is this action, cancelling it otherwise, or None."""
+        pending_action, self.pending_action = self.pending_action, None
+
+        if pending_action and pending_action[:2] == (tool.name, query):
+            return pending_action[2]
+        if pending_action:
+            pending_action[2].cancel()
+
+        return None
+
+    def run_tool(self, tool, query):
+        """Run a tool, serving repeated queries from the tool result cache."""
+        self.tools_used.add(tool.name.lower())
+
+        with self.tracer.span("tool_call", tool=tool.name) as span:
+            found, result = self.tool_cache.get(tool.name, query)
+            self.trace_cache_lookup(span, found)
+            if found:
+                return result
+
+            result = tool.run(query)
+            self.tool_cache.set(tool.name, query, result, tool.cache_ttl)
+            self.trace_tool_result(span, result)
+
+            return result
+
+    def trace_cache_lookup(self, span, found):
+        """Record a tool cache hit or miss on the span and in the metrics."""
+        span.set(cache_hit=found)
+        self.tracer.metrics.increment("tool_cache_hits_total" if found else "tool_cache_misses_total")
+
+    def trace_tool_result(self, span, result):
+        """Record on the span whether the tool reported an error."""
+        span.set(tool_error=ToolCache.is_error(result))
 
     def format_output(self, response):
         """Format output for better readability."""
         response = re.sub(r"Final Answer:", f"{Fore.RED}\n[FINAL ANSWER]:{Style.RESET_ALL}", response)
-        response = re.sub(r"Action:", f"{Fore.YELLOW}\n[ACTION]:{Style.RESET_ALL}", response)
+        response = re.sub(r"Action(\s+\d+)?:", f"{Fore.YELLOW}\n[ACTION\\1]:{Style.RESET_ALL}", response)
         response = re.sub(r"PAUSE", f"{Fore.MAGENTA}\n[PAUSE]:{Style.RESET_ALL}", response)
 
-        print(f"{Fore.GREEN}\n[ASSISTANT]:{Style.RESET_ALL} {response}\n")
+        self.log(f"{Fore.GREEN}\n[ASSISTANT]:{Style.RESET_ALL} {response}\n")
 
-    def get_llm_response(self, prompt):
+    def get_llm_response(self, prompt, instruction=None):
         """Call the OpenAI API to get a response."""
-        chat_history = [
-            {
-                "role": message.role,
-                "content": message.content,
-            }
-            for message in self.messages
-        ]
+        self.memory_management()
 
-        self.memory_management(chat_history)
+        messages = self.build_messages(prompt, instruction)
 
-        if self.old_chats_summary:
-            prompt += f"\n\nOld messages summary:\n{self.old_chats_summary}"
+        options = self.tool_options(instruction)
 
-        messages = [{"role": "system", "content": prompt}] + chat_history
+        with self.tracer.span("llm_call", model=self.model, stream=self.stream):
+            if self.stream:
+                response, usage = self.stream_llm_response(messages, **options)
+            else:
+                response, usage = self.read_completion(self.create_completion(includes_history=True, messages=messages, max_tokens=self.llm_max_tokens, stop=self.stop_sequences, **options))
 
-        raw_response = self.client.chat.completions.create(model=self.model, messages=messages, max_tokens=self.llm_max_tokens)
-        response = raw_response.choices[0].message.content
+            self.record_usage(usage, messages, response)
 
-        return response.strip() if response else "No response from LLM"
+        return self.clean_response(response)
+
+    def read_completion(self, raw_response):
+        """Return the (content, usage) of a completion, keeping its structured tool calls for apply_tool_calls."""
+        message = raw_response.choices[0].message
+        self.tool_calls = [(call.id, call.function.name, call.function.arguments) for call in message.tool_calls or []]
+
+        return message.content, raw_response.usage
+
+    def clean_response(self, response):
+        """Return the stripped response with its PAUSE restored, or a placeholder when the model sent neither text nor tool calls."""
+        if not response:
+            return "" if self.tool_calls else "No response from LLM"
+
+        return self.restore_pause(response.strip())
+
+    def tool_options(self, instruction=None):
+        """Extra request options that offer the tools as functions in function-calling mode, none when an instruction asks for an answer."""
+        if not self.function_calling:
+            return {}
+
+        return {"tools": self.tool_definitions(), "tool_choice": "none" if instruction else "auto"}
+
+    def collect_tool_call_deltas(self, tool_calls, delta):
+        """Accumulate the streamed fragments of the tool calls in a delta into tool_calls, {index: [id, name, arguments]}."""
+        for call in getattr(delta, "tool_calls", None) or []:
+            call_id, name, arguments = tool_calls.setdefault(call.index, ["", "", ""])
+            if call.function:
+                tool_calls[call.index] = [call_id or call.id or "", name + (call.function.name or ""), arguments + (call.function.arguments or "")]
+            elif call.id:
+                tool_calls[call.index][0] = call.id
+
+    def create_completion(self, bounded=True, includes_history=False, **request):
+        """Send a chat completion request through the shared rate limiter, retrying throttled and failed requests.
+
+        bounded limits every attempt, and the wait for a rate limit slot, by the remaining query deadline; background summaries are not bounded.
+        includes_history tells that the messages were built by build_messages, so the history's token count is already known.
+        """
+        cost = self.estimate_request_tokens(request["messages"], request["max_tokens"], request.get("tools"), includes_history)
+
+        for attempt in range(self.llm_retries + 1):
+            started_at = time.monotonic()
+            entry = self.rate_limiter.acquire(id(self), cost, self.slot_timeout(bounded))
+            self.trace_rate_limit(time.monotonic() - started_at)
+            throttled, retry_after = False, None
+
+            try:
+                response = self.client.chat.completions.create(model=self.model, **request, **(self.request_options() if bounded else {}))
+                if request.get("stream"):
+                    # A streamed generation holds its slot until it has been read, not just until the first chunk
+                    response, entry = self.release_after(response, entry), None
+                return response
+            except (RateLimitError, APIConnectionError, InternalServerError) as e:
+                throttled, retry_after, retry = self.classify_failure(e, attempt)
+                if not retry:
+                    raise
+            finally:
+                if entry is not None:
+                    self.rate_limiter.release(entry, throttled, retry_after)
+
+            # Throttled requests wait in the limiter until the pause ends, other failures back off here
+            if not throttled:
+                time.sleep(self.backoff(attempt))
+
+    def slot_timeout(self, bounded):
+        """Seconds a request may wait for a rate limit slot: the remaining query time when bounded, otherwise no limit."""
+        return self.budget.remaining_time() if bounded else None
+
+    def classify_failure(self, error, attempt):
+        """Return (throttled, retry_after, retry) for a failed LLM request: timeouts and the last attempt are not retried."""
+        throttled = isinstance(error, RateLimitError)
+        if throttled:
+            self.tracer.metrics.increment("llm_throttled_total")
+
+        retry = attempt < self.llm_retries and not isinstance(error, APITimeoutError)
+
+        return throttled, retry_after_seconds(error.response) if throttled else None, retry
+
+    @staticmethod
+    def backoff(attempt):
+        """Seconds to wait before retrying a failed request that was not throttled."""
+        return 0.5 * 2**attempt
+
+    def release_after(self, stream, entry):
+        """Yield the chunks of a streamed response, then return its rate limiter slot."""
+        try:
+            yield from stream
+        finally:
+            self.rate_limiter.release(entry)
+
+    def estimate_request_tokens(self, messages, max_tokens, tools=None, includes_history=False):
+        """Estimate what a request counts against the tokens-per-minute quota: its prompt tokens plus max_tokens, as Azure does.
+
+        Only a tokens-per-minute quota needs the estimate. The history is counted by messages_tokens and the static prompt
+        and tool definitions once per prompt cache, so a call only encodes its volatile context and instruction.
+        """
+        if not self.rate_limiter.tokens_per_minute:
+            return 0
+
+        tokens = max_tokens
+        if includes_history:
+            tokens += self.messages_tokens + self.static_tokens(messages[0]["content"], messages[0]["content"])
+            messages = messages[1:2] + messages[2 + len(self.messages) :]
+        if tools:
+            tokens += self.static_tokens("tools", tools)
+
+        return tokens + sum(self.num_tokens_from_text(message["content"]) for message in messages)
+
+    def static_tokens(self, key, content):
+        """Return the token count of a static part of the request, a text or JSON data, counted once and kept with the prompt cache."""
+        if ("tokens", key) not in self.prompt_cache:
+            self.prompt_cache[("tokens", key)] = self.num_tokens_from_text(content if isinstance(content, str) else json.dumps(content))
+
+        return self.prompt_cache[("tokens", key)]
+
+    def trace_rate_limit(self, waited):
+        """Record the time a request waited in the rate limiter on the current span and in the metrics."""
+        span = self.tracer.current()
+        if span:
+            span.set(rate_limit_wait=span.attributes.get("rate_limit_wait", 0) + waited)
+
+        self.tracer.metrics.observe("llm_rate_limit_wait_seconds", waited)
+
+    def request_options(self):
+        """Extra request options that bound an LLM call by the remaining query deadline."""
+        remaining_time = self.budget.remaining_time()
+
+        return {} if remaining_time is None else {"timeout": max(remaining_time, 0.1)}
+
+    def record_usage(self, usage, messages, response):
+        """Charge an LLM call to the query budget, estimating with the tokenizer when the API reports no usage."""
+        if usage:
+            prompt_tokens, completion_tokens = usage.prompt_tokens, usage.completion_tokens
+            cached_tokens = getattr(getattr(usage, "prompt_tokens_details", None), "cached_tokens", None) or 0
+        else:
+            prompt_tokens = self.static_tokens(messages[0]["content"], messages[0]["content"]) + self.num_tokens_from_text(messages[1]["content"]) + self.messages_tokens
+            completion_tokens, cached_tokens = self.num_tokens_from_text(response or ""), 0
+
+        self.budget.add_usage(prompt_tokens, completion_tokens, cached_tokens)
+        self.usage_totals["prompt_tokens"] += prompt_tokens
+        self.usage_totals["completion_tokens"] += completion_tokens
+        self.usage_totals["cached_tokens"] += cached_tokens
+        self.trace_usage(prompt_tokens, completion_tokens, cached_tokens)
+
+    def trace_usage(self, prompt_tokens, completion_tokens, cached_tokens):
+        """Record the token usage of an LLM call on the current span and in the metrics."""
+        span = self.tracer.current()
+        if span:
+            span.set(prompt_tokens=prompt_tokens, completion_tokens=completion_tokens, cached_tokens=cached_tokens)
+
+        self.tracer.metrics.increment("llm_prompt_tokens_total", prompt_tokens)
+        self.tracer.metrics.increment("llm_completion_tokens_total", completion_tokens)
+        self.tracer.metrics.increment("llm_cached_tokens_total", cached_tokens)
+
+    def stream_llm_response(self, messages, **options):
+        """Stream the OpenAI response and dispatch the action as soon as its line is complete."""
+        stream = self.create_completion(includes_history=True, messages=messages, max_tokens=self.llm_max_tokens, stop=self.stop_sequences, stream=True, stream_options={"include_usage": True}, **options)
+
+        state = self.new_stream_state()
+        for chunk in stream:
+            self.read_chunk(state, chunk)
+
+        return self.end_stream(state)
+
+    @staticmethod
+    def new_stream_state():
+        """Return the state read_chunk builds the streamed response in."""
+        return {"response": "", "usage": None, "line_start": 0, "tool_calls": {}}
+
+    def read_chunk(self, state, chunk):
+        """Add a streamed chunk to the response, emitting its tokens and dispatching an action line as soon as it is complete."""
+        # The final chunk only carries the token usage
+        state["usage"] = getattr(chunk, "usage", None) or state["usage"]
+
+        # Azure sends a content filter chunk without choices first
+        if not chunk.choices:
+            return
+
+        self.collect_tool_call_deltas(state["tool_calls"], chunk.choices[0].delta)
+        if not chunk.choices[0].delta.content:
+            return
+
+        state["response"] += chunk.choices[0].delta.content
+        self.emit("token", chunk.choices[0].delta.content)
+        state["line_start"] = self.scan_streamed_lines(state["response"], state["line_start"])
+
+    def end_stream(self, state):
+        """Return the (response, usage) of a finished stream, keeping its structured tool calls for apply_tool_calls."""
+        self.tool_calls = [tuple(state["tool_calls"][index]) for index in sorted(state["tool_calls"])]
+
+        return state["response"], state["usage"]
+
+    def scan_streamed_lines(self, response, line_start):
+        """Dispatch the first complete action line found after line_start and return the start of the unfinished line."""
+        while not self.parallel_actions and self.pending_action is None and "Final Answer:" not in response and "\n" in response[line_start:]:
+            line_end = response.index("\n", line_start)
+            line = response[line_start:line_end].strip()
+            line_start = line_end + 1
+
+            # The loop may think without tool calls left, but must not start one early
+            if line.startswith("Action:") and line != "Action:" and not self.budget.exhausted():
+                self.dispatch_action(line)
+
+        return line_start
+
+    def restore_pause(self, response):
+        """Re-append the PAUSE marker removed by the stop sequences so the history keeps the ReAct format."""
+        if re.search(r"Action(\s+\d+)?:", response) and "Final Answer:" not in response and not response.endswith("PAUSE"):
+            response += "\nPAUSE"
+
+        return response
 
     def summarize_old_chats(self, chats):
         """Summarizes old chat history and returns a concise summary response."""
-        prompt = self.summary_prompt.format(chats=chats)
-        messages = [{"role": "system", "content": prompt}]
+        messages = [{"role": "system", "content": self.summary_prompt.format(chats=chats)}]
 
-        raw_response = self.client.chat.completions.create(model=self.model, messages=messages, max_tokens=self.llm_max_tokens)
+        with self.tracer.span("summarization", messages=len(chats)):
+            return self.read_summary(self.create_completion(bounded=False, messages=messages, max_tokens=self.llm_max_tokens))
+
+    def read_summary(self, raw_response):
+        """Return the summary text of a completion, recording its token usage."""
         response = raw_response.choices[0].message.content
+        if raw_response.usage:
+            self.trace_usage(raw_response.usage.prompt_tokens, raw_response.usage.completion_tokens, 0)
 
         return response.strip() if response else "No response from LLM"
 
-    def get_indices(self, chat_history):
-        """Extracts a specified number of consecutive user queries from the given chat history."""
-        user_indices = [i for i, msg in enumerate(chat_history) if msg["role"] == "user"]
+    def get_indices(self, messages):
+        """Extracts a specified number of consecutive user queries from the given messages."""
+        user_indices = [i for i, msg in enumerate(messages) if msg.role == "user"]
 
         start_index = user_indices[0]
         end_index = user_indices[self.messages_to_summarize]
 
         return start_index, end_index
 
-    def memory_management(self, chat_history):
-        """Manages memory by summarizing and deleting old chat history"""
+    def memory_management(self):
+        """Manages memory by applying finished background summaries and scheduling new ones, without blocking."""
         try:
-            user_messages = [msg for msg in chat_history if msg["role"] == "user"]
-            if len(user_messages) > self.messages_to_summarize and self.num_tokens_from_messages(chat_history) > self.max_messages_tokens:
-                indices = self.get_indices(chat_history)
-                if indices:
-                    start_index, end_index = indices
-                    chats = chat_history[start_index:end_index]
-                    new_summary = self.summarize_old_chats(chats)
-                    print(f"##### Tokens used by the old messages: {self.num_tokens_from_messages(chats)}")
-                    # print("##### New Summary : ", new_summary)
-                    if new_summary != "No response from LLM":
-                        print(f"##### Tokens used by the new summary: {self.num_tokens_from_text(new_summary)}")
-                        self.old_chats_summary = f"{self.old_chats_summary} {new_summary}".strip()
-                        print("##### Old messages summary : ", self.old_chats_summary)
-                        del self.messages[start_index:end_index]
+            self.apply_summary()
+
+            user_messages = [msg for msg in self.messages if msg.role == "user"]
+            if self.pending_summary is None and len(user_messages) > self.messages_to_summarize and self.messages_tokens > self.max_messages_tokens:
+                start_index, end_index = self.get_indices(self.messages)
+                messages = self.messages[start_index:end_index]
+                chats = [{"role": message.role, "content": message.content} for message in messages]
+                self.pending_summary = (self.start_summary(chats), start_index, messages)
         except Exception as e:
-            print(f"An error occurred during memory management: {e}")
+            self.pending_summary = None
+            self.log(f"An error occurred during memory management: {e}")
+
+    def start_summary(self, chats):
+        """Summarizes old chats on a worker thread and returns the future."""
+        return self.submit(self.summarize_old_chats, chats)
+
+    def apply_summary(self):
+        """Replaces the summarized messages with the background summary once it is ready."""
+        if self.pending_summary is None or not self.pending_summary[0].done():
+            return
+
+        summary, start_index, messages = self.pending_summary
+        self.pending_summary = None
+        end_index = start_index + len(messages)
+
+        new_summary = summary.result()
+        self.log(f"##### Tokens used by the old messages: {self.num_tokens_from_messages(messages)}")
+
+        # Only apply the summary if the summarized messages are still in place
+        if new_summary != "No response from LLM" and self.messages[start_index:end_index] == messages:
+            self.log(f"##### Tokens used by the new summary: {self.num_tokens_from_text(new_summary)}")
+            self.old_chats_summary = f"{self.old_chats_summary} {new_summary}".strip()
+            self.log(f"##### Old messages summary : {self.old_chats_summary}")
+            if self.session_store and self.session_id:
+                self.persist(self.session_store.set_summary, self.session_id, self.old_chats_summary)
+            self.delete_messages(start_index, end_index)
+
+    def execute(self, query, budget=None, on_event=None):
+        """Execute a user query within the given QueryBudget (or the agent defaults) and return the full Agent response.
 
-    def execute(self, query):
-        """Execute a user query and return the full Agent response."""
+        on_event, if given, is called with an AgentEvent for every token, thought, action, observation and final answer.
+        """
+        self.load_history()
+        self.start_query(budget, on_event)
+
+        with self.tracer.span("query", query=query) as span:
+            cacheable, answer = self.open_query(query, span)
+
+            if answer:
+                self.replay_answer(answer)
+            elif not self.follow_route(self.match_route(query, span), span):
+                self.run_loop()
+                if cacheable:
+                    self.store_answer(query, self.latest_result_messages())
+
+            self.trace_query(span)
+
+            # Summarize in the background while the user reads the answer
+            self.memory_management()
+
+        return self.latest_result_messages()
+
+    def start_query(self, budget, on_event):
+        """Reset the per-query state and budget before a query."""
+        self.on_event = on_event
         self.current_iteration = 0
+        self.tools_used = set()
+        self.stop_reason = None
+        self.budget = budget or QueryBudget(deadline=self.query_deadline, max_tokens=self.max_query_tokens, max_tool_calls=self.max_tool_calls)
+
+    def open_query(self, query, span):
+        """Add the query to the conversation and return (cacheable, cached answer or None)."""
+        # Follow-up questions depend on the conversation so far, only queries that start one are cached
+        cacheable = not self.messages and not self.old_chats_summary
+        answer = self.lookup_answer(query, span) if cacheable else None
         self.add_message("user", query)
-        self.think()
 
+        return cacheable, answer
+
+    def latest_result_messages(self):
+        """Return the messages that answer the latest user query."""
         result_messages = []
         for message in self.messages[::-1]:
             if message.role == "user":
@@ -257,14 +1189,166 @@ class ReActAgent:
 
         return result_messages[::-1]
 
+    def lookup_answer(self, query, span):
+        """Return the cached (role, content) messages answering the query, or None, recording the outcome on the span."""
+        match, answer = self.answer_cache.get(query)
+        span.set(answer_cache=match or "miss")
+        self.tracer.metrics.increment("answer_cache_hits_total" if match else "answer_cache_misses_total")
+
+        return answer
+
+    def replay_answer(self, answer):
+        """Add the messages of a cached answer to the conversation as if the loop had produced them."""
+        for role, content in answer:
+            self.add_message(role, content)
+            if role == "assistant":
+                self.format_output(content)
+
+    def match_route(self, query, span):
+        """Return the router's route for a query, or None to answer it with the ReAct loop, recording the decision on the span."""
+        route = self.router.route(query) if self.router else None
+        if route and route.tool and route.tool not in self.tools:
+            route = None
+
+        span.set(route=route.rule if route else "react")
+        self.tracer.metrics.increment(f"router_{route.rule}_total" if route else "router_react_total")
+
+        return route
+
+    def follow_route(self, route, span):
+        """Answer a routed query without calling the LLM, returning False to fall back to the ReAct loop."""
+        if route is None:
+            return False
+
+        result = None
+        if route.tool:
+            self.budget.add_tool_calls()
+            result = self.run_tool(self.tools[route.tool], route.tool_query)
+
+        return self.answer_route(route, result, span)
+
+    def answer_route(self, route, result, span):
+        """Add the messages of a routed answer to the conversation as if the loop had produced them, unless the tool failed."""
+        if route.tool and ToolCache.is_error(result):
+            # Let the model deal with the failure, e.g. a misspelled city
+            span.set(route="react", route_fallback=route.rule)
+            self.tracer.metrics.increment("router_fallbacks_total")
+            return False
+
+        messages = [("assistant", f"Final Answer: {route.reply}")]
+        if route.tool:
+            observation = self.format_observation(route.tool, route.tool_query, result)
+            messages = [
+                ("assistant", f"Action: {route.tool}: {route.tool_query}\nPAUSE"),
+                ("system", f"Observation: {route.tool} tool output: {observation}"),
+                ("assistant", f"Final Answer: {route.answer(observation)}"),
+            ]
+
+        self.replay_answer(messages)
+        return True
+
+    def store_answer(self, query, result_messages):
+        """Cache a completed answer for as long as the most time-sensitive tool it used allows, and never past the end of the day."""
+        if self.stop_reason or not result_messages or "Final Answer:" not in result_messages[-1].content:
+            return
+
+        # The context gives the model today's date, so an answer may depend on it even without tools
+        now = datetime.now()
+        end_of_day = (datetime.combine(now.date() + timedelta(days=1), datetime.min.time()) - now).total_seconds()
+
+        ttls = [self.tools[name].cache_ttl for name in self.tools_used if name in self.tools and self.tools[name].cache_ttl]
+        self.answer_cache.set(query, [(message.role, message.content) for message in result_messages], min(ttls + [self.answer_cache_ttl, end_of_day]))
+
+    def trace_query(self, span):
+        """Record the totals of the finished query on its span."""
+        span.set(iterations=self.current_iteration, llm_calls=self.budget.llm_calls, tool_calls=self.budget.tool_calls, prompt_tokens=self.budget.prompt_tokens, completion_tokens=self.budget.completion_tokens)
+
+    def execute_events(self, query, budget=None):
+        """Execute a user query on a worker thread and yield its AgentEvents as they happen, ending with a "done" event."""
+        events = queue.Queue()
+
+        def run():
+            try:
+                result_messages = self.execute(query, budget, on_event=events.put)
+                events.put(AgentEvent("done", "", {"messages": result_messages}))
+            except Exception as e:
+                events.put(AgentEvent("done", "", {"messages": [], "error": e}))
+
+        threading.Thread(target=run, daemon=True).start()
+
+        while True:
+            event = events.get()
+            yield event
+            if event.type == "done":
+                return
+
+    def execute_many(self, queries, max_sessions=4):
+        """Execute independent (query_id, query) pairs on a bounded pool of fresh sessions and yield their result records in input order.
+
+        Every query runs within the agent's default query budget.
+        """
+        pending = collections.deque()
+
+        with ThreadPoolExecutor(max_workers=max_sessions) as pool:
+            for query_id, query in queries:
+                pending.append(pool.submit(self.execute_record, query_id, query))
+
+                # Keep a bounded window of queries in flight so long inputs are streamed
+                if len(pending) >= 2 * max_sessions:
+                    yield pending.popleft().result()
+
+            while pending:
+                yield pending.popleft().result()
+
+    def execute_record(self, query_id, query):
+        """Execute one query on a fresh session and return its result record."""
+        session = self.new_session()
+        started_at = time.perf_counter()
+
+        try:
+            result_messages, error = session.execute(query), None
+        except Exception as e:
+            result_messages, error = [], f"{type(e).__name__}: {e}"
+
+        return session.result_record(query_id, query, result_messages, error, time.perf_counter() - started_at)
+
+    def result_record(self, query_id, query, result_messages, error, latency):
+        """Build the JSON-serializable result record of a batch query."""
+        content = result_messages[-1].content if result_messages else ""
+        answer = content.split("Final Answer:", 1)[1].strip() if "Final Answer:" in content else content
+
+        return {
+            "id": query_id,
+            "query": query,
+            "answer": answer,
+            "error": error,
+            "latency": latency,
+            "iterations": self.current_iteration,
+            "llm_calls": self.budget.llm_calls,
+            "tool_calls": self.budget.tool_calls,
+            "prompt_tokens": self.budget.prompt_tokens,
+            "completion_tokens": self.budget.completion_tokens,
+            "messages": [{"role": message.role, "content": message.content} for message in result_messages],
+        }
+
 
 if __name__ == "__main__":
     init(autoreset=True)
     react_agent = ReActAgent()
 
+    if os.getenv("METRICS_PORT"):
+        react_agent.tracer.metrics.serve(int(os.getenv("METRICS_PORT")))
+
+    # With a session store the conversation survives restarts
+    if react_agent.session_store:
+        react_agent = react_agent.get_session(os.getenv("SESSION_ID", "cli"))
+
     while True:
         query = input(f"{Fore.CYAN}USER:{Style.RESET_ALL} ").strip()
         if query.lower() in ["exit", "quit"]:
+            print(f"{Fore.YELLOW}Tool cache: {react_agent.tool_cache.stats()}{Style.RESET_ALL}")
+            print(f"{Fore.YELLOW}Answer cache: {react_agent.answer_cache.stats()}{Style.RESET_ALL}")
+            print(f"{Fore.YELLOW}Token usage: {react_agent.usage_totals}{Style.RESET_ALL}")
             print(f"{Fore.YELLOW}Exiting the ReAct agent. Goodbye!{Style.RESET_ALL}")
             break
 
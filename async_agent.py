@@ -0,0 +1,375 @@
+import asyncio
+import collections
+import os
+import time
+
+from colorama import Fore, Style, init
+from openai import APIConnectionError, APITimeoutError, AsyncAzureOpenAI, InternalServerError, RateLimitError
+
+from agent import ReActAgent
+from tools.base_tool import run_in_thread
+from utils.events import AgentEvent
+from utils.rate_limiter import RateLimitTimeout
+
+
+class AsyncReActAgent(ReActAgent):
+    """ReAct agent that runs the Thought-Action loop on an asyncio event loop, so one process can serve many conversations."""
+
+    def get_llm_client(self):
+        llm_client = AsyncAzureOpenAI(
+            api_key=os.getenv("AZURE_OPENAI_API_KEY"),
+            api_version=os.getenv("OPENAI_API_VERSION"),
+            azure_endpoint=os.getenv("AZURE_OPENAI_ENDPOINT"),
+            max_retries=0,  # Retries go through the shared rate limiter in create_completion
+        )
+        return llm_client
+
+    def reset_conversation(self):
+        super().reset_conversation()
+        self.pending_write = None
+        self.tool_slots = None
+
+    def persist(self, write, *args):
+        """Queue a session store write on a worker thread behind the earlier ones, so store I/O stays off the event loop and in order."""
+        self.pending_write = asyncio.ensure_future(self.write_after(self.pending_write, write, *args))
+
+    async def write_after(self, previous, write, *args):
+        """Run a session store write once the previous one has finished."""
+        if previous is not None:
+            await asyncio.wait([previous])
+
+        try:
+            await run_in_thread(write, *args)
+        except Exception as e:
+            self.log(f"{Fore.RED}Error: Failed to write to the session store: {e}{Style.RESET_ALL}")
+
+    async def flush_writes(self):
+        """Wait until the queued session store writes have finished."""
+        if self.pending_write is not None:
+            await self.pending_write
+
+    async def cache_call(self, fn, *args):
+        """Call the tool cache, on a worker thread when it has a SQLite tier."""
+        if self.tool_cache.db is None:
+            return fn(*args)
+
+        return await run_in_thread(fn, *args)
+
+    async def aclose(self):
+        """Close the async HTTP clients of the tools and the LLM client when the agent shuts down, they are shared by all its sessions."""
+        await self.http.aclose()
+        await self.client.close()
+
+    async def run_loop(self):
+        """Run the Thought-Action loop as a state machine until a final answer or an exhausted budget, tracing each iteration."""
+        state, payload = "think", None
+
+        while state != "done":
+            with self.tracer.span("iteration", iteration=self.current_iteration + 1):
+                state, payload = await self.step(state, payload)
+                while state in ("act", "plan"):
+                    state, payload = await self.step(state, payload)
+
+    async def step(self, state, payload):
+        """Run one state of the loop and return the next (state, payload)."""
+        reason = self.budget_stop_reason(state)
+        if reason:
+            await self.force_final_answer(reason)
+            return "done", None
+
+        try:
+            if state == "think":
+                return await self.think()
+            if state == "act":
+                return await self.execute_action(*payload)
+            return await self.execute_plan(payload)
+        except (APITimeoutError, RateLimitTimeout):
+            await self.force_final_answer("deadline")
+            return "done", None
+
+    async def think(self):
+        """Think and decide on the next state based on the response from OpenAI."""
+        response = await self.get_llm_response(self.start_iteration())
+
+        return self.process_response(response)
+
+    async def force_final_answer(self, reason):
+        """Degrade gracefully when a budget runs out by asking for a Final Answer without further actions."""
+        response = None
+
+        if self.stop_query(reason):
+            try:
+                response = await self.get_llm_response(self.build_prompt(), instruction=self.final_answer_prompt)
+            except Exception as e:
+                self.log(f"{Fore.RED}Error: Failed to force a final answer: {e}{Style.RESET_ALL}")
+
+        self.add_forced_answer(reason, response)
+
+    async def execute_action(self, tool_name, query):
+        """Act on the response by awaiting the appropriate tool, then go back to thinking."""
+        tool = self.tools.get(tool_name)
+
+        if tool:
+            self.budget.add_tool_calls()
+            return self.add_observation(tool_name, query, await self.get_action_result(tool, query))
+
+        return self.tool_not_found(tool_name)
+
+    async def execute_plan(self, action_lines):
+        """Run a plan of actions as asyncio tasks, starting each one as soon as its dependencies have finished."""
+        plan = self.parse_plan(action_lines)
+        actions = {action_id: (tool_name, query) for action_id, (tool_name, query, _) in plan.items()}
+        results = {}
+        running = {}
+
+        while plan or running:
+            # Start every action whose dependencies are satisfied, the tool slots run at most max_workers of them at a time
+            for action_id, tool, query in self.ready_actions(plan, results):
+                running[asyncio.create_task(self.arun_tool(tool, query))] = action_id
+
+            if not running:
+                self.fail_unresolved(plan, results)
+                break
+
+            done, _ = await asyncio.wait(running, timeout=self.budget.remaining_time(), return_when=asyncio.FIRST_COMPLETED)
+
+            if not done:
+                # Deadline reached, cancel the remaining actions
+                self.fail_timed_out(plan, running, results)
+                for task in running:
+                    task.cancel()
+                break
+
+            self.collect_results(done, running, results)
+
+        return self.add_plan_observation(actions, results)
+
+    def dispatch_action(self, action_line):
+        """Start a tool call as a task as soon as its action line has been streamed."""
+        try:
+            tool_name, query = self.parse_action_line(action_line)
+        except ValueError:
+            return
+
+        tool = self.tools.get(tool_name)
+        if tool:
+            self.pending_action = (tool_name, query, asyncio.create_task(self.arun_tool(tool, query)))
+
+    async def get_action_result(self, tool, query):
+        """Return the tool output within the deadline, reusing the task of an action dispatched while streaming."""
+        task = self.take_pending_action(tool, query) or self.arun_tool(tool, query)
+
+        try:
+            return await asyncio.wait_for(task, timeout=self.budget.remaining_time())
+        except asyncio.TimeoutError:
+            return "Error: Tool call timed out"
+
+    async def arun_tool(self, tool, query):
+        """Await a tool in one of the query's max_workers tool slots, serving repeated queries from the tool result cache."""
+        self.tools_used.add(tool.name.lower())
+
+        with self.tracer.span("tool_call", tool=tool.name) as span:
+            found, result = await self.cache_call(self.tool_cache.get, tool.name, query)
+            self.trace_cache_lookup(span, found)
+            if found:
+                return result
+
+            async with self.tool_slots:
+                result = await tool.arun(query)
+
+            await self.cache_call(self.tool_cache.set, tool.name, query, result, tool.cache_ttl)
+            self.trace_tool_result(span, result)
+
+            return result
+
+    async def follow_route(self, route, span):
+        """Answer a routed query without calling the LLM, returning False to fall back to the ReAct loop."""
+        if route is None:
+            return False
+
+        result = None
+        if route.tool:
+            self.budget.add_tool_calls()
+            result = await self.arun_tool(self.tools[route.tool], route.tool_query)
+
+        return self.answer_route(route, result, span)
+
+    async def get_llm_response(self, prompt, instruction=None):
+        """Call the OpenAI API asynchronously to get a response."""
+        self.memory_management()
+
+        messages = self.build_messages(prompt, instruction)
+
+        options = self.tool_options(instruction)
+
+        with self.tracer.span("llm_call", model=self.model, stream=self.stream):
+            if self.stream:
+                response, usage = await self.stream_llm_response(messages, **options)
+            else:
+                response, usage = self.read_completion(await self.create_completion(includes_history=True, messages=messages, max_tokens=self.llm_max_tokens, stop=self.stop_sequences, **options))
+
+            self.record_usage(usage, messages, response)
+
+        return self.clean_response(response)
+
+    async def create_completion(self, bounded=True, includes_history=False, **request):
+        """Send a chat completion request through the shared rate limiter without blocking the event loop, retrying throttled and failed requests."""
+        cost = self.estimate_request_tokens(request["messages"], request["max_tokens"], request.get("tools"), includes_history)
+
+        for attempt in range(self.llm_retries + 1):
+            started_at = time.monotonic()
+            entry = await self.rate_limiter.acquire_async(id(self), cost, self.slot_timeout(bounded))
+            self.trace_rate_limit(time.monotonic() - started_at)
+            throttled, retry_after = False, None
+
+            try:
+                response = await self.client.chat.completions.create(model=self.model, **request, **(self.request_options() if bounded else {}))
+                if request.get("stream"):
+                    # A streamed generation holds its slot until it has been read, not just until the first chunk
+                    response, entry = self.release_after(response, entry), None
+                return response
+            except (RateLimitError, APIConnectionError, InternalServerError) as e:
+                throttled, retry_after, retry = self.classify_failure(e, attempt)
+                if not retry:
+                    raise
+            finally:
+                if entry is not None:
+                    self.rate_limiter.release(entry, throttled, retry_after)
+
+            # Throttled requests wait in the limiter until the pause ends, other failures back off here
+            if not throttled:
+                await asyncio.sleep(self.backoff(attempt))
+
+    async def release_after(self, stream, entry):
+        """Yield the chunks of a streamed response, then return its rate limiter slot."""
+        try:
+            async for chunk in stream:
+                yield chunk
+        finally:
+            self.rate_limiter.release(entry)
+
+    async def stream_llm_response(self, messages, **options):
+        """Stream the OpenAI response and dispatch the action as soon as its line is complete."""
+        stream = await self.create_completion(includes_history=True, messages=messages, max_tokens=self.llm_max_tokens, stop=self.stop_sequences, stream=True, stream_options={"include_usage": True}, **options)
+
+        state = self.new_stream_state()
+        async for chunk in stream:
+            self.read_chunk(state, chunk)
+
+        return self.end_stream(state)
+
+    async def summarize_old_chats(self, chats):
+        """Summarizes old chat history and returns a concise summary response."""
+        messages = [{"role": "system", "content": self.summary_prompt.format(chats=chats)}]
+
+        with self.tracer.span("summarization", messages=len(chats)):
+            return self.read_summary(await self.create_completion(bounded=False, messages=messages, max_tokens=self.llm_max_tokens))
+
+    def start_summary(self, chats):
+        """Summarizes old chats in a background task and returns the task."""
+        return asyncio.create_task(self.summarize_old_chats(chats))
+
+    async def execute(self, query, budget=None, on_event=None):
+        """Execute a user query within the given QueryBudget (or the agent defaults) and return the full Agent response.
+
+        on_event, if given, is called with an AgentEvent for every token, thought, action, observation and final answer.
+        """
+        await run_in_thread(self.load_history)
+        self.start_query(budget, on_event)
+        # Created here, on Python 3.8 a semaphore binds to the event loop it is created on
+        self.tool_slots = asyncio.Semaphore(self.max_workers)
+
+        with self.tracer.span("query", query=query) as span:
+            cacheable, answer = self.open_query(query, span)
+
+            if answer:
+                self.replay_answer(answer)
+            elif not await self.follow_route(self.match_route(query, span), span):
+                await self.run_loop()
+                if cacheable:
+                    self.store_answer(query, self.latest_result_messages())
+
+            self.trace_query(span)
+
+            # Summarize in the background while the user reads the answer
+            self.memory_management()
+
+        await self.flush_writes()
+
+        return self.latest_result_messages()
+
+    async def execute_events(self, query, budget=None):
+        """Execute a user query in a task and yield its AgentEvents as they happen, ending with a "done" event."""
+        events = asyncio.Queue()
+
+        async def run():
+            try:
+                result_messages = await self.execute(query, budget, on_event=events.put_nowait)
+                events.put_nowait(AgentEvent("done", "", {"messages": result_messages}))
+            except Exception as e:
+                events.put_nowait(AgentEvent("done", "", {"messages": [], "error": e}))
+
+        task = asyncio.create_task(run())
+
+        try:
+            while True:
+                event = await events.get()
+                yield event
+                if event.type == "done":
+                    return
+        finally:
+            # Stopping the iteration early cancels the query instead of leaving it running unobserved
+            if not task.done():
+                task.cancel()
+
+    async def execute_many(self, queries, max_sessions=4):
+        """Execute independent (query_id, query) pairs on at most max_sessions concurrent sessions and yield their result records in input order.
+
+        Every query runs within the agent's default query budget.
+        """
+        semaphore = asyncio.Semaphore(max_sessions)
+        pending = collections.deque()
+
+        for query_id, query in queries:
+            pending.append(asyncio.create_task(self.execute_record(query_id, query, semaphore)))
+
+            # Keep a bounded window of queries in flight so long inputs are streamed
+            if len(pending) >= 2 * max_sessions:
+                yield await pending.popleft()
+
+        while pending:
+            yield await pending.popleft()
+
+    async def execute_record(self, query_id, query, semaphore=None):
+        """Execute one query on a fresh session and return its result record."""
+        async with semaphore or asyncio.Semaphore():
+            session = self.new_session()
+            started_at = time.perf_counter()
+
+            try:
+                result_messages, error = await session.execute(query), None
+            except Exception as e:
+                result_messages, error = [], f"{type(e).__name__}: {e}"
+
+            return session.result_record(query_id, query, result_messages, error, time.perf_counter() - started_at)
+
+
+async def main():
+    react_agent = AsyncReActAgent()
+
+    try:
+        while True:
+            query = (await asyncio.get_running_loop().run_in_executor(None, input, f"{Fore.CYAN}USER:{Style.RESET_ALL} ")).strip()
+            if query.lower() in ["exit", "quit"]:
+                print(f"{Fore.YELLOW}Exiting the ReAct agent. Goodbye!{Style.RESET_ALL}")
+                break
+
+            await react_agent.execute(query)
+            print("\n" + "=" * 60 + "\n")
+    finally:
+        await react_agent.aclose()
+
+
+if __name__ == "__main__":
+    init(autoreset=True)
+    asyncio.run(main())
@@ -0,0 +1,136 @@
+import argparse
+import asyncio
+import json
+import os
+import re
+import sys
+import time
+
+from colorama import Fore, Style, init
+
+from utils.stats import percentile
+
+
+def read_queries(path, id_field="id", query_field="query"):
+    """Yield (query_id, query) pairs from a JSONL file of records or a text file with one query per line."""
+    with open(path, "r") as file:
+        for line_number, line in enumerate(file, start=1):
+            line = line.strip()
+            if not line:
+                continue
+
+            if path.endswith(".jsonl"):
+                record = json.loads(line)
+                yield str(record.get(id_field, line_number)), record[query_field]
+            else:
+                # Use the '1. ' numbering of test_queries.txt as the ID when present
+                match = re.match(r"(\d+)\.\s*(.*)", line)
+                yield (match.group(1), match.group(2)) if match else (str(line_number), line)
+
+
+def completed_ids(path):
+    """Return the IDs already answered in the output file, so an interrupted run can resume. Queries that failed are run again."""
+    if not os.path.exists(path):
+        return set()
+
+    ids = set()
+    with open(path, "r") as file:
+        for line in file:
+            try:
+                record = json.loads(line)
+                if not record.get("error"):
+                    ids.add(str(record["id"]))
+            except (ValueError, KeyError, AttributeError):
+                # A partially written last line from an interrupted run
+                continue
+
+    return ids
+
+
+def report(records, skipped, elapsed):
+    """Return the throughput report of a batch run."""
+    latencies = [record["latency"] for record in records]
+
+    return {
+        "completed": len(records),
+        "resumed_skipped": skipped,
+        "errors": sum(1 for record in records if record["error"]),
+        "elapsed": elapsed,
+        "throughput_qps": len(records) / elapsed if elapsed else 0.0,
+        "latency_p50": percentile(latencies, 0.50),
+        "latency_p95": percentile(latencies, 0.95),
+        "llm_calls": sum(record["llm_calls"] for record in records),
+        "prompt_tokens": sum(record["prompt_tokens"] for record in records),
+        "completion_tokens": sum(record["completion_tokens"] for record in records),
+    }
+
+
+def run_batch(args):
+    if args.use_async:
+        from async_agent import AsyncReActAgent as Agent
+    else:
+        from agent import ReActAgent as Agent
+
+    agent = Agent()
+    agent.verbose = args.verbose
+    agent.stream = args.stream
+    agent.parallel_actions = args.parallel_actions
+    agent.function_calling = args.function_calling
+    agent.query_deadline = args.deadline
+
+    # Skip the queries a previous run already answered in the output file
+    done = completed_ids(args.output)
+    queries = [(query_id, query) for query_id, query in read_queries(args.input, args.id_field, args.query_field) if query_id not in done]
+    records = []
+
+    started_at = time.perf_counter()
+    with open(args.output, "a") as output:
+
+        def write(record):
+            output.write(json.dumps(record, default=str) + "\n")
+            output.flush()
+            records.append(record)
+            print(f"{Fore.GREEN}[{record['id']}]{Style.RESET_ALL} {record['latency']:.2f}s {record['error'] or record['answer'][:80]}", file=sys.stderr)
+
+        if args.use_async:
+
+            async def consume():
+                try:
+                    async for record in agent.execute_many(queries, args.sessions):
+                        write(record)
+                finally:
+                    await agent.aclose()
+
+            asyncio.run(consume())
+        else:
+            for record in agent.execute_many(queries, args.sessions):
+                write(record)
+
+    return report(records, len(done), time.perf_counter() - started_at)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run many independent queries through the ReAct agent, streaming JSONL results with checkpoint and resume.")
+    parser.add_argument("input", help="A .jsonl file of records or a text file with one query per line.")
+    parser.add_argument("--output", default="batch_results.jsonl", help="JSONL results file, also used as the checkpoint to resume from.")
+    parser.add_argument("--id-field", default="id", help="Record field holding the query ID in a .jsonl input.")
+    parser.add_argument("--query-field", default="query", help="Record field holding the query in a .jsonl input.")
+    parser.add_argument("--sessions", type=int, default=4, help="Queries run concurrently, each on its own session.")
+    parser.add_argument("--deadline", type=float, default=None, help="Seconds each query may run for.")
+    parser.add_argument("--stream", action="store_true", help="Use the streaming mode.")
+    parser.add_argument("--parallel-actions", action="store_true", help="Let the model plan several actions per step.")
+    parser.add_argument("--function-calling", action="store_true", help="Use native function calling instead of text Action lines.")
+    parser.add_argument("--async", dest="use_async", action="store_true", help="Run the sessions on an asyncio event loop instead of threads.")
+    parser.add_argument("--verbose", action="store_true", help="Show the agent's console output.")
+    args = parser.parse_args()
+
+    summary = run_batch(args)
+
+    print(f"\n{Fore.YELLOW}Batch report{Style.RESET_ALL}", file=sys.stderr)
+    for key, value in summary.items():
+        print(f"{key:>20}: {value:.4f}" if isinstance(value, float) else f"{key:>20}: {value}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    init(autoreset=True)
+    main()
@@ -0,0 +1,141 @@
+import argparse
+import json
+import os
+import re
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from benchmarks.stub_server import StubChatServer
+from benchmarks.stub_tools import stub_tools
+from utils.stats import percentile
+
+
+def load_queries(path):
+    """Read one query per line, dropping the '1. ' numbering used in test_queries.txt."""
+    with open(path, "r") as file:
+        return [re.sub(r"^\d+\.\s*", "", line.strip()) for line in file if line.strip()]
+
+
+def run_session(agent, session_id, queries):
+    """Run the queries of one conversation in order and collect per-query measurements."""
+    records = []
+
+    for query_id, query in queries:
+        boundaries = []
+
+        def on_event(event):
+            # An iteration ends with its observation or with the final answer
+            if event.type in ("observation", "final_answer"):
+                boundaries.append(time.perf_counter())
+
+        started_at = time.perf_counter()
+        agent.execute(query, on_event=on_event)
+        finished_at = time.perf_counter()
+
+        iteration_starts = [started_at] + boundaries[:-1]
+        records.append(
+            {
+                "id": query_id,
+                "session": session_id,
+                "query": query,
+                "latency": finished_at - started_at,
+                "iterations": agent.current_iteration,
+                "iteration_latencies": [end - start for start, end in zip(iteration_starts, boundaries)],
+                "llm_calls": agent.budget.llm_calls,
+                "tool_calls": agent.budget.tool_calls,
+                "prompt_tokens": agent.budget.prompt_tokens,
+                "completion_tokens": agent.budget.completion_tokens,
+            }
+        )
+
+    return records
+
+
+def run_benchmark(args):
+    server = StubChatServer(args.transcripts, latency=args.llm_latency, token_latency=args.token_latency, tokens_per_minute=args.server_tpm).start()
+
+    os.environ.update(
+        {
+            "AZURE_OPENAI_ENDPOINT": server.url,
+            "AZURE_OPENAI_API_KEY": "stub-key",
+            "OPENAI_API_VERSION": "2024-06-01",
+            "MODEL_NAME": args.model,
+        }
+    )
+
+    from agent import ReActAgent
+
+    base_agent = ReActAgent()
+    base_agent.tools = stub_tools(latency=args.tool_latency)
+    base_agent.stream = args.stream
+    base_agent.parallel_actions = args.parallel_actions
+    base_agent.function_calling = args.function_calling
+    base_agent.verbose = not args.quiet
+
+    # Spread the workload round-robin over independent conversations
+    queries = list(enumerate(load_queries(args.queries) * args.repeat, start=1))
+    workload = [queries[i :: args.sessions] for i in range(args.sessions)]
+    sessions = [base_agent.new_session() for _ in range(args.sessions)]
+
+    started_at = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.sessions) as pool:
+        results = list(pool.map(run_session, sessions, range(args.sessions), workload))
+    elapsed = time.perf_counter() - started_at
+    server.stop()
+
+    records = sorted([record for session_records in results for record in session_records], key=lambda record: record["id"])
+    latencies = [record["latency"] for record in records]
+    iteration_latencies = [latency for record in records for latency in record["iteration_latencies"]]
+
+    summary = {
+        "queries": len(records),
+        "sessions": args.sessions,
+        "elapsed": elapsed,
+        "throughput_qps": len(records) / elapsed if elapsed else 0.0,
+        "latency_p50": percentile(latencies, 0.50),
+        "latency_p95": percentile(latencies, 0.95),
+        "iteration_latency_p50": percentile(iteration_latencies, 0.50),
+        "iteration_latency_p95": percentile(iteration_latencies, 0.95),
+        "llm_calls_per_query": sum(record["llm_calls"] for record in records) / len(records),
+        "prompt_tokens_per_query": sum(record["prompt_tokens"] for record in records) / len(records),
+        "prompt_tokens_total": sum(record["prompt_tokens"] for record in records),
+        "llm_requests": server.requests,
+        "summarizations": server.summaries,
+        "summarizations_per_query": server.summaries / len(records),
+        "throttled_requests": server.throttled,
+    }
+    config = {key: value for key, value in vars(args).items() if key != "output"}
+
+    return {"config": config, "summary": summary, "metrics": base_agent.tracer.metrics.snapshot(), "queries": records}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the ReAct agent offline against a stub chat completions server and stub tools.")
+    parser.add_argument("--queries", default="test_queries.txt", help="Workload file with one query per line.")
+    parser.add_argument("--transcripts", default="benchmarks/transcripts.json", help="Scripted responses replayed by the stub server.")
+    parser.add_argument("--sessions", type=int, default=4, help="Concurrent conversations.")
+    parser.add_argument("--repeat", type=int, default=1, help="Times to repeat the workload.")
+    parser.add_argument("--llm-latency", type=float, default=0.2, help="Seconds before the first token of each LLM response.")
+    parser.add_argument("--token-latency", type=float, default=0.005, help="Seconds per streamed chunk.")
+    parser.add_argument("--tool-latency", type=float, default=0.05, help="Seconds per stub tool call.")
+    parser.add_argument("--server-tpm", type=int, default=None, help="Tokens-per-minute quota emulated by the stub server, answering 429 above it.")
+    parser.add_argument("--model", default="gpt-4o", help="Model name used for the tokenizer.")
+    parser.add_argument("--stream", action="store_true", help="Use the streaming mode.")
+    parser.add_argument("--parallel-actions", action="store_true", help="Use the parallel plan mode.")
+    parser.add_argument("--function-calling", action="store_true", help="Use native function calling instead of text Action lines.")
+    parser.add_argument("--output", default="bench_output.json", help="Where to write the JSON results.")
+    parser.add_argument("--verbose", dest="quiet", action="store_false", help="Show the agent's console output.")
+    args = parser.parse_args()
+
+    report = run_benchmark(args)
+
+    with open(args.output, "w") as file:
+        json.dump(report, file, indent=2)
+
+    for key, value in report["summary"].items():
+        print(f"{key:>26}: {value:.4f}" if isinstance(value, float) else f"{key:>26}: {value}")
+    print(f"\nResults written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,229 @@
+import collections
+import json
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class StubChatServer:
+    """Local OpenAI-compatible chat completions server that replays scripted ReAct transcripts with configurable latency."""
+
+    def __init__(self, transcripts_path="benchmarks/transcripts.json", latency=0.2, token_latency=0.005, tokens_per_minute=None, host="127.0.0.1", port=0):
+        """
+        :param transcripts_path: JSON file with the scripted responses, see benchmarks/transcripts.json.
+        :param latency: Seconds before the first token of every response.
+        :param token_latency: Seconds between streamed chunks, also charged per chunk for non-streamed responses.
+        :param tokens_per_minute: Emulated quota, requests over it get a 429 with a retry-after-ms header like Azure. None for no limit.
+        """
+        with open(transcripts_path, "r") as file:
+            self.transcripts = json.load(file)
+
+        self.latency = latency
+        self.token_latency = token_latency
+        self.lock = threading.Lock()
+        self.tokens_per_minute = tokens_per_minute
+        self.window = collections.deque()
+        self.requests = 0
+        self.summaries = 0
+        self.throttled = 0
+        self.server = ThreadingHTTPServer((host, port), self.make_handler())
+        self.server.daemon_threads = True
+        self.thread = None
+
+    @property
+    def url(self):
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def script_response(self, messages):
+        """Pick the scripted response for the current step of the conversation's latest query."""
+        if messages and messages[0]["content"].startswith("You are an AI assistant summarizing"):
+            with self.lock:
+                self.summaries += 1
+            return self.transcripts["summary"]
+
+        user_indices = [i for i, message in enumerate(messages) if message["role"] == "user"]
+        query = messages[user_indices[-1]]["content"] if user_indices else ""
+        step = sum(1 for message in messages[user_indices[-1] + 1 :] if message["role"] == "assistant") if user_indices else 0
+
+        steps = self.transcripts["default"]
+        for rule in self.transcripts["rules"]:
+            if re.search(rule["match"], query, flags=re.IGNORECASE):
+                steps = rule["steps"]
+                break
+
+        return steps[min(step, len(steps) - 1)]
+
+    def throttle(self, cost):
+        """Charge a request against the sliding one-minute quota and return the seconds to retry after, or None if it is within quota."""
+        if not self.tokens_per_minute:
+            return None
+
+        with self.lock:
+            now = time.monotonic()
+            while self.window and self.window[0][0] <= now - 60:
+                self.window.popleft()
+
+            used = sum(tokens for _, tokens in self.window)
+            if used + cost <= self.tokens_per_minute:
+                self.window.append((now, cost))
+                return None
+
+            self.throttled += 1
+            # Wait until enough of the window has expired for this request
+            for started_at, tokens in self.window:
+                used -= tokens
+                if used + cost <= self.tokens_per_minute:
+                    return started_at + 60 - now
+            return 60.0
+
+    @staticmethod
+    def apply_stop(text, stop):
+        """Cut the text at the first stop sequence, like the real API does."""
+        positions = [text.find(sequence) for sequence in stop or [] if sequence in text]
+        return text[: min(positions)] if positions else text
+
+    @staticmethod
+    def count_tokens(text):
+        return (len(text) + 3) // 4
+
+    @staticmethod
+    def to_tool_calls(text, tools):
+        """Turn the scripted Action lines of a response into structured tool calls, for requests that offer functions.
+
+        The input goes to the function's first array parameter when it is a JSON list or the function takes no text, otherwise to its first text parameter.
+        """
+        parameters = {tool["function"]["name"]: tool["function"].get("parameters", {}).get("properties", {}) for tool in tools}
+        content, tool_calls = [], []
+
+        for line in text.split("\n"):
+            match = re.match(r"Action(?:\s+\d+)?:\s*(\w+):\s*(.*)", line.strip())
+            if not match or match.group(1) not in parameters:
+                content.append(line)
+                continue
+
+            name, value = match.group(1), match.group(2).strip()
+            try:
+                items = json.loads(value)
+            except ValueError:
+                items = None
+
+            properties = parameters[name]
+            array = next((key for key, schema in properties.items() if schema.get("type") == "array"), None)
+            string = next((key for key, schema in properties.items() if schema.get("type") == "string"), None)
+            if array and (isinstance(items, list) or not string):
+                arguments = {array: items if isinstance(items, list) else [value]}
+            else:
+                arguments = {string or "query": value}
+
+            tool_calls.append({"id": f"call_{len(tool_calls)}", "type": "function", "function": {"name": name, "arguments": json.dumps(arguments)}})
+
+        return "\n".join(content).strip(), tool_calls
+
+    def make_handler(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_POST(self):
+                body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))))
+                if not self.path.split("?")[0].endswith("/chat/completions"):
+                    self.send_json(404, {"error": {"message": f"Unknown path {self.path}"}})
+                    return
+
+                with stub.lock:
+                    stub.requests += 1
+
+                messages = body.get("messages", [])
+                retry_after = stub.throttle(sum(stub.count_tokens(message.get("content") or "") for message in messages) + (body.get("max_tokens") or 0))
+                if retry_after is not None:
+                    self.send_json(429, {"error": {"code": "429", "message": "Rate limit exceeded."}}, {"retry-after-ms": str(int(retry_after * 1000))})
+                    return
+
+                text = stub.apply_stop(stub.script_response(messages), body.get("stop"))
+                tool_calls = []
+                if body.get("tools") and body.get("tool_choice") != "none":
+                    text, tool_calls = stub.to_tool_calls(text, body["tools"])
+                usage = {
+                    "prompt_tokens": sum(stub.count_tokens(message.get("content") or "") for message in messages),
+                    "completion_tokens": stub.count_tokens(text),
+                }
+                usage["total_tokens"] = usage["prompt_tokens"] + usage["completion_tokens"]
+                chunks = [text[i : i + 16] for i in range(0, len(text), 16)]
+
+                time.sleep(stub.latency)
+
+                if tool_calls:
+                    usage["completion_tokens"] += stub.count_tokens(json.dumps(tool_calls))
+                    usage["total_tokens"] = usage["prompt_tokens"] + usage["completion_tokens"]
+
+                if body.get("stream"):
+                    self.send_stream(body.get("model"), chunks, usage, tool_calls)
+                else:
+                    time.sleep(stub.token_latency * len(chunks))
+                    self.send_json(
+                        200,
+                        {
+                            "id": "chatcmpl-stub",
+                            "object": "chat.completion",
+                            "created": int(time.time()),
+                            "model": body.get("model"),
+                            "choices": [{"index": 0, "message": {"role": "assistant", "content": text or None, **({"tool_calls": tool_calls} if tool_calls else {})}, "finish_reason": "tool_calls" if tool_calls else "stop"}],
+                            "usage": usage,
+                        },
+                    )
+
+            def send_json(self, status, payload, headers=None):
+                data = json.dumps(payload).encode()
+                self.send_response(status)
+                for name, value in (headers or {}).items():
+                    self.send_header(name, value)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def send_stream(self, model, chunks, usage, tool_calls=()):
+                self.send_response(200)
+                self.send_header("Content-Type", "text/event-stream")
+                self.send_header("Connection", "close")
+                self.end_headers()
+
+                base = {"id": "chatcmpl-stub", "object": "chat.completion.chunk", "created": int(time.time()), "model": model}
+                for chunk in chunks:
+                    event = dict(base, choices=[{"index": 0, "delta": {"content": chunk}, "finish_reason": None}])
+                    self.wfile.write(f"data: {json.dumps(event)}\n\n".encode())
+                    self.wfile.flush()
+                    time.sleep(stub.token_latency)
+
+                # Each call streams its name first, then its arguments
+                for index, call in enumerate(tool_calls):
+                    head = {"index": index, "id": call["id"], "type": "function", "function": {"name": call["function"]["name"], "arguments": ""}}
+                    for delta in (head, {"index": index, "function": {"arguments": call["function"]["arguments"]}}):
+                        event = dict(base, choices=[{"index": 0, "delta": {"tool_calls": [delta]}, "finish_reason": None}])
+                        self.wfile.write(f"data: {json.dumps(event)}\n\n".encode())
+                        self.wfile.flush()
+                        time.sleep(stub.token_latency)
+
+                finish_reason = "tool_calls" if tool_calls else "stop"
+                self.wfile.write(f"data: {json.dumps(dict(base, choices=[{'index': 0, 'delta': {}, 'finish_reason': finish_reason}]))}\n\n".encode())
+                self.wfile.write(f"data: {json.dumps(dict(base, choices=[], usage=usage))}\n\n".encode())
+                self.wfile.write(b"data: [DONE]\n\n")
+                self.wfile.flush()
+                self.close_connection = True
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
@@ -0,0 +1,33 @@
+import json
+import time
+
+from tools.base_tool import BaseTool
+
+STUB_OUTPUTS = {
+    "calculator": "42",
+    "weather": "The temperature in {query} is 21.5°C. The weather is clear sky. The humidity is 60%. The wind speed is 3.1 m/s.",
+    "web_search": [{"title": "Stub result for {query}", "content": "Scripted search content about {query}.", "url": "https://example.com/{query}", "score": 0.9}],
+    "wikipedia": {"query": "{query}", "title": "{query}", "summary": "Scripted Wikipedia summary about {query}."},
+}
+
+
+class StubTool(BaseTool):
+    """Offline stand-in for a real tool that answers with canned output after a fixed latency."""
+
+    def __init__(self, name, description, latency=0.05, cache_ttl=0, observation_tokens=None, parameters=None):
+        super().__init__(name=name, description=description, cache_ttl=cache_ttl, observation_tokens=observation_tokens, parameters=parameters)
+        self.latency = latency
+        self.calls = 0
+
+    def run(self, query: str):
+        time.sleep(self.latency)
+        self.calls += 1
+        return json.loads(json.dumps(STUB_OUTPUTS.get(self.name, "ok")).replace("{query}", json.dumps(query)[1:-1]))
+
+
+def stub_tools(manifest_path="tools/manifest.json", latency=0.05):
+    """Build one StubTool per manifest entry, keeping the real names, descriptions, cache TTLs, observation budgets and parameters."""
+    with open(manifest_path, "r") as file:
+        manifest = json.load(file)
+
+    return {entry["name"]: StubTool(entry["name"], entry["description"], latency, entry.get("cache_ttl", 0), entry.get("observation_tokens"), entry.get("parameters")) for entry in manifest}
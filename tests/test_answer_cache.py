@@ -0,0 +1,81 @@
+import time
+
+from utils.answer_cache import AnswerCache
+
+
+def test_normalize_folds_case_whitespace_and_sentence_punctuation():
+    assert AnswerCache.normalize("What's the  weather in Paris?") == AnswerCache.normalize("whats the weather in paris")
+    assert AnswerCache.normalize("Who wrote Hamlet?!") == AnswerCache.normalize("who wrote hamlet")
+
+
+def test_normalize_keeps_decimal_points():
+    assert AnswerCache.normalize("What is 3.5 + 1?") != AnswerCache.normalize("What is 35 + 1?")
+
+
+def test_normalize_keeps_operators():
+    assert AnswerCache.normalize("Calculate (2+3)*4 and say if it is even") != AnswerCache.normalize("Calculate (2*3)-4 and say if it is even")
+    assert AnswerCache.normalize("Calculate (2+3)*4") == AnswerCache.normalize("calculate ( 2 + 3 ) * 4")
+
+
+def test_normalize_keeps_comparison_and_minus_signs():
+    assert AnswerCache.normalize("Is 5 > 3?") != AnswerCache.normalize("Is 5 < 3?")
+    assert AnswerCache.normalize("What is -3 + 2?") != AnswerCache.normalize("What is 3 + 2?")
+
+
+def test_keywords_distinguish_operator_order():
+    first = AnswerCache.keywords(AnswerCache.normalize("Calculate (2+3)*4"))
+    second = AnswerCache.keywords(AnswerCache.normalize("Calculate (2*3)+4"))
+
+    assert first != second
+
+
+def test_exact_hit_and_miss():
+    cache = AnswerCache()
+    cache.set("Is 5 > 3?", "yes", ttl=60)
+
+    assert cache.get("is 5 > 3") == ("exact", "yes")
+    assert cache.get("Is 5 < 3?") == (None, None)
+    assert cache.stats()["hits"] == 1 and cache.stats()["misses"] == 1
+
+
+def test_similar_queries_must_share_expression():
+    cache = AnswerCache(similarity=0.5)
+    cache.set("Calculate (2+3)*4 and say if it is even", "20, even", ttl=60)
+
+    assert cache.get("Please calculate (2+3)*4 and say if it is even")[0] == "similar"
+    assert cache.get("Calculate (2*3)-4 and say if it is even") == (None, None)
+    assert cache.get("Calculate (2*3)+4 and say if it is even") == (None, None)
+
+
+def test_similar_queries_must_share_content_words():
+    cache = AnswerCache(similarity=0.5)
+    cache.set("What is the weather in Paris?", "sunny", ttl=60)
+
+    assert cache.get("What is the weather in Perth?") == (None, None)
+
+
+def test_expired_entries_are_dropped():
+    cache = AnswerCache()
+    cache.set("Who wrote Hamlet?", "Shakespeare", ttl=0.01)
+    time.sleep(0.02)
+
+    assert cache.get("Who wrote Hamlet?") == (None, None)
+    assert cache.stats()["entries"] == 0
+
+
+def test_zero_ttl_is_not_cached():
+    cache = AnswerCache()
+    cache.set("Who wrote Hamlet?", "Shakespeare", ttl=0)
+
+    assert cache.get("Who wrote Hamlet?") == (None, None)
+
+
+def test_least_recently_used_entry_is_evicted():
+    cache = AnswerCache(max_entries=2)
+    cache.set("first question", 1, ttl=60)
+    cache.set("second question", 2, ttl=60)
+    cache.get("first question")
+    cache.set("third question", 3, ttl=60)
+
+    assert cache.get("second question") == (None, None)
+    assert cache.get("first question") == ("exact", 1)
@@ -0,0 +1,18 @@
+import json
+
+from batch import completed_ids
+from utils.stats import percentile
+
+
+def test_resume_skips_only_answered_queries(tmp_path):
+    output = tmp_path / "results.jsonl"
+    records = [{"id": "1", "error": "RateLimitError: throttled"}, {"id": "2", "error": None}, {"id": "3", "error": "APITimeoutError"}, {"id": "3", "error": None}]
+    output.write_text("".join(json.dumps(record) + "\n" for record in records) + '{"id": "4", "err')
+
+    assert completed_ids(str(output)) == {"2", "3"}
+
+
+def test_percentile_uses_the_nearest_rank():
+    assert percentile([], 0.5) == 0.0
+    assert percentile([3, 1, 2, 4], 0.5) == 2
+    assert percentile(list(range(1, 101)), 0.95) == 95
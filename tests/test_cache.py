@@ -0,0 +1,35 @@
+from utils.cache import ToolCache
+
+
+def test_combined_result_with_a_failed_part_is_not_cached():
+    cache = ToolCache()
+    cache.set("weather", '["Dhaka", "Atlantis"]', "Dhaka: 31°C, haze, humidity 70%, wind 3.6 m/s\nAtlantis: Request failed: timed out", 600)
+
+    assert cache.get("weather", '["Dhaka", "Atlantis"]') == (False, None)
+
+
+def test_combined_result_without_failures_is_cached():
+    result = "Dhaka: 31°C, haze, humidity 70%, wind 3.6 m/s\nTokyo: 18°C, clear sky, humidity 40%, wind 2.1 m/s"
+    cache = ToolCache()
+    cache.set("weather", '["Dhaka", "Tokyo"]', result, 600)
+
+    assert cache.get("weather", '["Dhaka", "Tokyo"]') == (True, result)
+
+
+def test_expired_disk_row_is_deleted_on_lookup(tmp_path):
+    cache = ToolCache(db_path=str(tmp_path / "cache.db"))
+    cache.db.execute("INSERT INTO tool_cache (key, value, expires_at) VALUES (?, ?, ?)", (ToolCache.make_key("wikipedia", "Mars"), '"old"', 1.0))
+
+    assert cache.get("wikipedia", "Mars") == (False, None)
+    assert cache.db.execute("SELECT COUNT(*) FROM tool_cache").fetchone()[0] == 0
+
+
+def test_disk_tier_is_pruned_to_max_disk_entries(tmp_path):
+    cache = ToolCache(db_path=str(tmp_path / "cache.db"), max_disk_entries=5, prune_interval=10)
+    cache.db.execute("INSERT INTO tool_cache (key, value, expires_at) VALUES (?, ?, ?)", ("wikipedia:expired", '"old"', 1.0))
+
+    for i in range(20):
+        cache.set("wikipedia", f"page {i}", f"summary {i}", 60 + i)
+
+    keys = [row[0] for row in cache.db.execute("SELECT key FROM tool_cache ORDER BY expires_at")]
+    assert keys == [f"wikipedia:page {i}" for i in range(15, 20)]
@@ -0,0 +1,42 @@
+import pytest
+
+from tools.calculator import CalculatorTool
+
+
+@pytest.fixture
+def calculator():
+    return CalculatorTool()
+
+
+@pytest.mark.parametrize("expression", ["__import__('os').system('ls')", "x + 1", "(1).real", "[1, 2]", "'a' * 3", "abs(x=1)", "True + 1"])
+def test_unsupported_elements_are_rejected(calculator, expression):
+    assert calculator.run(expression).startswith("Error:")
+
+
+@pytest.mark.parametrize("expression", ["2 ** 5000", "(-3) ** 4000", "0.5 ** -5000", "9 ** 9 ** 9"])
+def test_results_beyond_the_size_limit_are_rejected(calculator, expression):
+    assert calculator.run(expression) == "Error: Result is too large."
+
+
+@pytest.mark.parametrize("expression, result", [("2 ** -5000", "0"), ("0.5 ** 5000", "0"), ("2 ** 4000 // 2 ** 3999", "2"), ("10 ** -2", "0.01")])
+def test_large_exponents_with_small_results_are_evaluated(calculator, expression, result):
+    assert calculator.run(expression) == result
+
+
+def test_factorial_and_round_are_limited(calculator):
+    assert calculator.run("factorial(171)") == "Error: factorial is limited to 170."
+    assert calculator.run("round(1, -1000)") == "Error: round is limited to 400 digits."
+
+
+def test_multiple_expressions_give_one_line_each(calculator):
+    assert calculator.run('{"expressions": ["15*4+6", "66 % 9", "1/0"]}') == "15*4+6 = 66\n66 % 9 = 3\n1/0 = Error: Division by zero is not allowed."
+    assert calculator.run('["2^3", "sqrt(16)"]') == "2^3 = 8\nsqrt(16) = 4"
+
+
+@pytest.mark.parametrize("query", ['{"expressions": "1+2"}', '{"expressions": [1, 2]}', '{"expressions": {"a": "1"}}', '["1+2", 3]'])
+def test_expressions_must_be_a_list_of_strings(calculator, query):
+    assert calculator.run(query) == "Error: expressions must be a list of strings."
+
+
+def test_batch_size_is_limited(calculator):
+    assert calculator.run(str(["1"] * 101).replace("'", '"')) == "Error: At most 100 expressions can be evaluated at once."
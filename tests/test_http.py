@@ -0,0 +1,18 @@
+import asyncio
+
+from utils.http import HttpTransport
+
+
+def test_aclose_closes_and_drops_the_async_clients():
+    http = HttpTransport(base_urls={"stub": "http://127.0.0.1:9"})
+
+    async def use_and_close():
+        clients = [http.async_client("stub"), http.async_client("other")]
+        await http.aclose()
+        return clients
+
+    clients = asyncio.run(use_and_close())
+
+    assert all(client.is_closed for client in clients)
+    assert http.async_clients == {}
+    assert not http.async_client("stub").is_closed
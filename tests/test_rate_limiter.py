@@ -0,0 +1,31 @@
+import asyncio
+
+import pytest
+
+from utils.rate_limiter import RateLimiter, RateLimitTimeout
+
+
+def test_acquire_gives_up_after_timeout_and_leaves_the_queue():
+    limiter = RateLimiter(requests_per_minute=1)
+    limiter.acquire("first", 0)
+
+    with pytest.raises(RateLimitTimeout):
+        limiter.acquire("second", 0, timeout=0.1)
+
+    assert limiter.stats()["waiting"] == 0
+
+
+def test_acquire_async_gives_up_after_timeout_and_leaves_the_queue():
+    limiter = RateLimiter(requests_per_minute=1)
+    limiter.acquire("first", 0)
+
+    with pytest.raises(RateLimitTimeout):
+        asyncio.run(limiter.acquire_async("second", 0, timeout=0.1))
+
+    assert limiter.stats()["waiting"] == 0
+
+
+def test_acquire_within_quota_ignores_timeout():
+    limiter = RateLimiter(requests_per_minute=2)
+
+    assert limiter.acquire("session", 0, timeout=0) is not None
@@ -0,0 +1,29 @@
+import pytest
+
+from utils.router import QueryRouter
+
+
+@pytest.fixture
+def router():
+    return QueryRouter()
+
+
+@pytest.mark.parametrize("query", ["What is 12/25/2024?", "12-25-2024", "what is 2024-12-25", "what's 1/2/3", "1990-2000", "what is 1.5-2.5?", "What is 9/11?", "24/7", "7-11"])
+def test_dates_ranges_and_names_are_left_to_the_llm(router, query):
+    assert router.route(query) is None
+
+
+@pytest.mark.parametrize("query, expression", [("calculate 12/25/2024", "12/25/2024"), ("Compute 2024-12-25", "2024-12-25"), ("calculate 9/11", "9/11")])
+def test_an_explicit_verb_still_routes_to_the_calculator(router, query, expression):
+    route = router.route(query)
+
+    assert route.rule == "arithmetic"
+    assert route.tool_query == expression
+
+
+@pytest.mark.parametrize("query, expression", [("what is 2+3*4", "2+3*4"), ("what is 10 - 2", "10 - 2"), ("(15 * 4 + 6) % 9", "(15 * 4 + 6) % 9")])
+def test_arithmetic_routes_to_the_calculator(router, query, expression):
+    route = router.route(query)
+
+    assert route.rule == "arithmetic"
+    assert route.tool_query == expression
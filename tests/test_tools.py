@@ -0,0 +1,27 @@
+import pytest
+
+from tools.base_tool import load_manifest, tool_metadata
+from tools.calculator import CalculatorTool
+from tools.lazy_tool import LazyTool
+
+
+def test_tool_metadata_comes_from_the_manifest():
+    entry = next(entry for entry in load_manifest() if entry["name"] == "calculator")
+    tool = CalculatorTool()
+
+    assert tool.description == entry["description"]
+    assert tool.observation_tokens == entry["observation_tokens"]
+    assert tool.parameters == entry["parameters"]
+
+
+def test_tool_metadata_rejects_unlisted_tools():
+    with pytest.raises(ValueError):
+        tool_metadata("no_such_tool")
+
+
+def test_lazy_tool_reports_load_failures_through_log():
+    messages = []
+    tool = LazyTool("missing", "A tool whose module does not exist.", "tools.no_such_module", "MissingTool", log=messages.append)
+
+    assert tool.run("query").startswith("Error: Tool 'missing' is unavailable")
+    assert len(messages) == 1 and "Failed to load tool missing" in messages[0]
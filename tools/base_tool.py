@@ -1,21 +1,62 @@
+import asyncio
+import contextvars
+import json
+import os
 from abc import ABC, abstractmethod
+from functools import lru_cache
+
+from utils.tool_schema import QUERY_PARAMETERS
+
+MANIFEST_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "manifest.json")
+
+
+@lru_cache(maxsize=None)
+def load_manifest():
+    """Return the entries of tools/manifest.json, the single source of each listed tool's name, description, cache TTL, observation budget and parameters."""
+    with open(MANIFEST_PATH, "r") as file:
+        return json.load(file)
+
+
+def manifest_entry(name):
+    """Return a tool's entry in tools/manifest.json, or {} if it is not listed."""
+    return next((entry for entry in load_manifest() if entry["name"] == name), {})
+
+
+def tool_metadata(name):
+    """Return the BaseTool arguments declared for a tool in tools/manifest.json, so the tool class and its LazyTool never disagree."""
+    entry = manifest_entry(name)
+    if not entry:
+        raise ValueError(f"Tool '{name}' is not listed in {MANIFEST_PATH}.")
+
+    return {"name": entry["name"], "description": entry["description"], "cache_ttl": entry.get("cache_ttl", 0), "observation_tokens": entry.get("observation_tokens"), "parameters": entry.get("parameters")}
+
+
+async def run_in_thread(fn, *args):
+    """Run a blocking function on the event loop's default executor in a copy of the current context, like asyncio.to_thread on Python 3.9+."""
+    return await asyncio.get_running_loop().run_in_executor(None, contextvars.copy_context().run, fn, *args)
 
 
 class BaseTool(ABC):
     """Abstract base class for all tools."""
 
-    def __init__(self, name: str, description: str):
+    def __init__(self, name: str, description: str, cache_ttl: int = 0, observation_tokens: int = None, parameters: dict = None):
         """
         Initializes a tool with a name and description.
 
         :param name: Name of the tool (converted to lowercase for consistency).
         :param description: A brief description of the tool.
+        :param cache_ttl: Seconds a result stays in the agent's tool cache (0 disables caching).
+        :param observation_tokens: Token budget for the tool's observations (None uses the agent's default, 0 never trims).
+        :param parameters: JSON schema of the tool's arguments in function-calling mode, a single 'query' string by default.
         """
         if not isinstance(name, str):
             raise ValueError("Tool name must be a string.")
 
         self._name = name.lower()  # Ensuring consistent lowercase tool names
         self._description = description
+        self._cache_ttl = cache_ttl
+        self._observation_tokens = observation_tokens
+        self._parameters = parameters or QUERY_PARAMETERS
 
     @property
     def name(self) -> str:
@@ -27,6 +68,21 @@ class BaseTool(ABC):
         """Returns the tool's description."""
         return self._description
 
+    @property
+    def cache_ttl(self) -> int:
+        """Returns how long the tool's results may be cached, in seconds."""
+        return self._cache_ttl
+
+    @property
+    def observation_tokens(self) -> int:
+        """Returns the token budget for the tool's observations."""
+        return self._observation_tokens
+
+    @property
+    def parameters(self) -> dict:
+        """Returns the JSON schema of the tool's arguments."""
+        return self._parameters
+
     @abstractmethod
     def run(self, query: str) -> str:
         """
@@ -36,3 +92,15 @@ class BaseTool(ABC):
         :return: The tool's response as a string.
         """
         pass
+
+    async def arun(self, query: str) -> str:
+        """
+        Asynchronous counterpart of run, used by the AsyncReActAgent.
+
+        Tools without a native async implementation fall back to running
+        the blocking run method on a worker thread.
+
+        :param query: The input query for the tool.
+        :return: The tool's response as a string.
+        """
+        return await run_in_thread(self.run, query)
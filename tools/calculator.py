@@ -1,73 +1,196 @@
+import ast
 import json
-
-from .base_tool import BaseTool
+import math
+import operator
+from functools import lru_cache
+
+from .base_tool import BaseTool, tool_metadata
+
+BINARY_OPERATORS = {
+    ast.Add: operator.add,
+    ast.Sub: operator.sub,
+    ast.Mult: operator.mul,
+    ast.Div: operator.truediv,
+    ast.FloorDiv: operator.floordiv,
+    ast.Mod: operator.mod,
+    ast.Pow: operator.pow,
+}
+
+UNARY_OPERATORS = {ast.UAdd: operator.pos, ast.USub: operator.neg}
+
+FUNCTIONS = {
+    "abs": abs,
+    "round": round,
+    "min": min,
+    "max": max,
+    "sqrt": math.sqrt,
+    "cbrt": lambda x: math.copysign(abs(x) ** (1 / 3), x),
+    "exp": math.exp,
+    "log": math.log,
+    "log10": math.log10,
+    "log2": math.log2,
+    "floor": math.floor,
+    "ceil": math.ceil,
+    "sin": math.sin,
+    "cos": math.cos,
+    "tan": math.tan,
+    "asin": math.asin,
+    "acos": math.acos,
+    "atan": math.atan,
+    "radians": math.radians,
+    "degrees": math.degrees,
+    "factorial": math.factorial,
+}
+
+CONSTANTS = {"pi": math.pi, "e": math.e, "tau": math.tau}
+
+LEGACY_OPERATIONS = {"add": "+", "subtract": "-", "multiply": "*", "divide": "/", "power": "**", "modulus": "%"}
 
 
 class CalculatorTool(BaseTool):
     def __init__(self):
-        super().__init__(
-            name="calculator",
-            description="Performs basic mathematical operations such as addition, multiplication, subtraction, division, exponentiation, and modulus. Each operation must be called separately with structured JSON input.",
-        )
+        super().__init__(**tool_metadata("calculator"))
+        self.max_expression_length = 500
+        self.max_nodes = 200
+        self.max_batch_size = 100
+        self.max_result_bits = 4096
+        self.max_factorial = 170
+        self.max_round_digits = 400
 
-    def multiply(self, a: float, b: float) -> float:
-        return a * b
+    @staticmethod
+    @lru_cache(maxsize=1024)
+    def parse(expression):
+        """Parse an expression into an AST, cached so repeated expressions are parsed once."""
+        # "^" is written for exponentiation in plain math
+        return ast.parse(expression.strip().replace("^", "**"), mode="eval").body
 
-    def add(self, a: float, b: float) -> float:
-        return a + b
+    def check_size(self, value):
+        """Reject complex results and results too large to be useful, so a single expression cannot exhaust memory or CPU."""
+        if isinstance(value, complex):
+            raise ValueError("Result is not a real number.")
+        if isinstance(value, int) and value.bit_length() > self.max_result_bits:
+            raise ValueError("Result is too large.")
+        return value
 
-    def subtract(self, a: float, b: float) -> float:
-        return a - b
+    def evaluate_node(self, node):
+        """Evaluate an AST node, allowing only numbers, constants, arithmetic operators and whitelisted functions."""
+        if isinstance(node, ast.Constant) and isinstance(node.value, (int, float)) and not isinstance(node.value, bool):
+            return node.value
 
-    def divide(self, a: float, b: float) -> float:
-        if b == 0:
-            return "Error: Division by zero is not allowed."
-        return a / b
+        if isinstance(node, ast.Name) and node.id in CONSTANTS:
+            return CONSTANTS[node.id]
+
+        if isinstance(node, ast.UnaryOp) and type(node.op) in UNARY_OPERATORS:
+            return UNARY_OPERATORS[type(node.op)](self.evaluate_node(node.operand))
+
+        if isinstance(node, ast.BinOp) and type(node.op) in BINARY_OPERATORS:
+            left, right = self.evaluate_node(node.left), self.evaluate_node(node.right)
+
+            # Bound the size of the result, not the exponent: 2 ** -5000 is tiny but 0.5 ** -5000 is huge
+            if isinstance(node.op, ast.Pow) and left and right * math.log2(abs(left)) > self.max_result_bits:
+                raise ValueError("Result is too large.")
+
+            return self.check_size(BINARY_OPERATORS[type(node.op)](left, right))
+
+        if isinstance(node, ast.Call) and isinstance(node.func, ast.Name) and node.func.id in FUNCTIONS and not node.keywords:
+            args = [self.check_size(self.evaluate_node(arg)) for arg in node.args]
+
+            if node.func.id == "factorial" and args and args[0] > self.max_factorial:
+                raise ValueError(f"factorial is limited to {self.max_factorial}.")
+
+            # round(1, -10**8) builds a power of ten with a hundred million digits
+            if node.func.id == "round" and len(args) > 1 and isinstance(args[1], int) and abs(args[1]) > self.max_round_digits:
+                raise ValueError(f"round is limited to {self.max_round_digits} digits.")
 
-    def power(self, a: float, b: float) -> float:
-        """Raises 'a' to the power of 'b'."""
-        return a**b
+            return self.check_size(FUNCTIONS[node.func.id](*args))
 
-    def modulus(self, a: float, b: float) -> float:
-        result = int(a) % int(b)  # Ensure integer division before modulus
-        return result
+        raise ValueError(f"Unsupported element '{ast.unparse(node) if hasattr(ast, 'unparse') else type(node).__name__}'.")
+
+    def evaluate(self, expression):
+        """Evaluate one expression and return the formatted result or an error message."""
+        if len(expression) > self.max_expression_length:
+            return f"Error: Expression is longer than {self.max_expression_length} characters."
+
+        try:
+            tree = self.parse(expression)
+            if sum(1 for _ in ast.walk(tree)) > self.max_nodes:
+                return f"Error: Expression has more than {self.max_nodes} elements."
+
+            return self.format_number(self.evaluate_node(tree))
+        except ZeroDivisionError:
+            return "Error: Division by zero is not allowed."
+        except SyntaxError:
+            return f"Error: Invalid expression '{expression}'."
+        except (ValueError, TypeError, OverflowError) as e:
+            return f"Error: {e}"
+
+    @staticmethod
+    def format_number(value):
+        """Format a result without float noise, e.g. 3 instead of 3.0000000000000004."""
+        if isinstance(value, float):
+            if math.isfinite(value) and value.is_integer() and abs(value) < 1e15:
+                return str(int(value))
+            return f"{value:.12g}"
+        return str(value)
+
+    def parse_query(self, query):
+        """Return the list of expressions in a query and whether it was a batch.
+
+        Accepts a plain expression, a JSON list of expressions, {"expression": ...}, {"expressions": [...]}
+        or the older {"operation": ..., "params": {"a": ..., "b": ...}} format. Raises ValueError for a batch that is not a list of strings.
+        """
+        try:
+            data = json.loads(query)
+        except (TypeError, ValueError):
+            return [query], False
+
+        if isinstance(data, dict) and "expressions" in data:
+            data = data["expressions"]
+            if not isinstance(data, list):
+                raise ValueError("expressions must be a list of strings.")
+        if isinstance(data, list):
+            if not all(isinstance(item, str) for item in data):
+                raise ValueError("expressions must be a list of strings.")
+            return data, True
+        if isinstance(data, dict) and "expression" in data:
+            return [str(data["expression"])], False
+        if isinstance(data, dict) and data.get("operation") in LEGACY_OPERATIONS:
+            params = data.get("params", {})
+            return [f"({params.get('a')}) {LEGACY_OPERATIONS[data['operation']]} ({params.get('b')})"], False
+
+        return [str(data)], False
 
     def run(self, query: str) -> str:
         """
-        Parses a structured JSON query and executes the corresponding mathematical function.
+        Evaluates an arithmetic expression, or a batch of expressions, safely.
 
-        Expected query format:
-        {
-            "operation": "add",
-            "params": {"a": 5, "b": 3}
-        }
+        Example queries:
+        (3.5*12)+7^2
+        ["15*4+6", "sqrt(2)", "66 % 9"]
 
-        Returns the result as a string.
+        Returns the result as a string, one "<expression> = <result>" line per expression for a batch.
         """
         try:
-            # Ensure query is valid JSON
-            data = json.loads(query)
+            expressions, is_batch = self.parse_query(query)
+        except ValueError as e:
+            return f"Error: {e}"
 
-            # Validate JSON structure
-            if "operation" not in data or "params" not in data:
-                return "Error: Missing 'operation' or 'params' in request. Ensure the format is {'operation': 'add', 'params': {'a': 5, 'b': 3}}."
+        if not expressions:
+            return "Error: No expression to evaluate."
+        if len(expressions) > self.max_batch_size:
+            return f"Error: At most {self.max_batch_size} expressions can be evaluated at once."
 
-            operation = data["operation"]
-            params = data["params"]
+        # Evaluate each distinct expression once
+        results = {expression: self.evaluate(expression) for expression in dict.fromkeys(expressions)}
 
-            if not isinstance(params, dict) or "a" not in params or "b" not in params:
-                return "Error: Parameters must be in the format {'a': <num>, 'b': <num>}."
+        if not is_batch:
+            return results[expressions[0]]
 
-            if hasattr(self, operation):
-                method = getattr(self, operation)
-                return str(method(**params))
-            else:
-                return f"Error: Unknown operation '{operation}'. Available operations: add, multiply, subtract, divide, power, modulus."
+        return "\n".join(f"{expression} = {results[expression]}" for expression in expressions)
 
-        except json.JSONDecodeError:
-            return "Error: Invalid JSON input. Ensure the input follows the format {'operation': 'add', 'params': {'a': 5, 'b': 3}}."
-        except Exception as e:
-            return f"Error: {str(e)}"
+    async def arun(self, query: str) -> str:
+        """Evaluates on the event loop, the calculation is too cheap to need a worker thread."""
+        return self.run(query)
 
 
 # === For standalone testing ===
@@ -75,12 +198,13 @@ if __name__ == "__main__":
     calculator_tool = CalculatorTool()
 
     test_queries = [
-        '{"operation": "multiply", "params": {"a": 2, "b": 4}}',
-        '{"operation": "add", "params": {"a": 10, "b": 5}}',
-        '{"operation": "subtract", "params": {"a": 7, "b": 20}}',
-        '{"operation": "divide", "params": {"a": 100, "b": 5}}',
-        '{"operation": "power", "params": {"base": 2, "exponent": 3}}',
-        '{"operation": "modulus", "params": {"a": 10, "b": 3}}',
+        "(3.5*12)+7^2",
+        '["15*4+6", "sqrt(2)", "66 % 9", "27 ** (1/3)"]',
+        '{"expression": "round(pi * 2 ** 2, 2)"}',
+        '{"operation": "power", "params": {"a": 2, "b": 3}}',
+        "10 / 0",
+        "9 ** 9 ** 9",
+        "__import__('os').system('ls')",
     ]
 
     for query in test_queries:
@@ -0,0 +1,60 @@
+import importlib
+import threading
+
+from colorama import Fore, Style
+
+from utils.tool_schema import QUERY_PARAMETERS
+
+
+class LazyTool:
+    """Stands in for a tool listed in the manifest and only imports and creates it on first use."""
+
+    def __init__(self, name, description, module, class_name, cache_ttl=0, observation_tokens=None, parameters=None, factory=None, log=print):
+        """
+        :param name: Name of the tool, as used in actions.
+        :param description: Description shown in the system prompt.
+        :param module: Module that implements the tool, e.g. 'tools.weather'.
+        :param class_name: Name of the BaseTool subclass in that module.
+        :param cache_ttl: Seconds a result stays in the agent's tool cache.
+        :param observation_tokens: Token budget for the tool's observations.
+        :param parameters: JSON schema of the tool's arguments in function-calling mode.
+        :param factory: Callable that creates an instance from the tool class.
+        :param log: Callable that reports load failures, the agent's logger when registered by an agent.
+        """
+        self.name = name.lower()
+        self.description = description
+        self.module = module
+        self.class_name = class_name
+        self.cache_ttl = cache_ttl
+        self.observation_tokens = observation_tokens
+        self.parameters = parameters or QUERY_PARAMETERS
+        self.factory = factory or (lambda tool_class: tool_class())
+        self.log = log
+        self.instance = None
+        self.lock = threading.Lock()
+
+    def load(self):
+        """Imports and creates the tool once, returning the shared instance."""
+        with self.lock:
+            if self.instance is None:
+                tool_class = getattr(importlib.import_module(self.module), self.class_name)
+                self.instance = self.factory(tool_class)
+            return self.instance
+
+    def run(self, query):
+        try:
+            tool = self.load()
+        except Exception as e:
+            self.log(f"\n{Fore.RED}[ERROR] Failed to load tool {self.name}: {e}{Style.RESET_ALL}\n")
+            return f"Error: Tool '{self.name}' is unavailable: {e}"
+
+        return tool.run(query)
+
+    async def arun(self, query):
+        try:
+            tool = self.load()
+        except Exception as e:
+            self.log(f"\n{Fore.RED}[ERROR] Failed to load tool {self.name}: {e}{Style.RESET_ALL}\n")
+            return f"Error: Tool '{self.name}' is unavailable: {e}"
+
+        return await tool.arun(query)
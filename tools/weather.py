@@ -1,62 +1,187 @@
+import asyncio
+import json
 import os
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
 
-import requests
+import httpx
 from dotenv import load_dotenv
 
-from .base_tool import BaseTool
+from utils.cache import ERROR_PREFIXES
+from utils.http import HttpTransport
+
+from .base_tool import BaseTool, tool_metadata
 
 
 class WeatherTool(BaseTool):
-    def __init__(self):
+    def __init__(self, http=None):
         load_dotenv()
-        super().__init__(
-            name="weather",
-            description="Fetches weather information for a given city. Input is only the name of the city. e.g. 'Tokyo'.",
-        )
+        super().__init__(**tool_metadata("weather"))
 
         self.base_url = "http://api.openweathermap.org/data/2.5/weather"
         self.api_key = os.getenv("OPENWEATHER_API_KEY")
+        self.http = http or HttpTransport()
+        self.max_cities = 10
+        self.executor = ThreadPoolExecutor(max_workers=4)
+
+        # Upstream requests in flight per normalized city, shared by every session using this tool
+        self.in_flight = {}
+        self.async_in_flight = {}
+        self.lock = threading.Lock()
+        self.coalesced = 0
 
         if not self.api_key:
             raise ValueError("Missing API Key: Please set 'OPENWEATHER_API_KEY' in the .env file.")
 
+    @staticmethod
+    def normalize_city(city):
+        return " ".join(city.lower().split())
+
+    def parse_cities(self, query):
+        """Return the distinct cities of a query: a city name, a JSON list of names or {"cities": [...]}."""
+        try:
+            data = json.loads(query)
+        except (TypeError, ValueError):
+            data = query
+
+        if isinstance(data, dict):
+            data = data.get("cities", data.get("city", ""))
+        cities = data if isinstance(data, list) else [data]
+
+        distinct = {}
+        for city in cities:
+            city = str(city).strip()
+            if city:
+                distinct.setdefault(self.normalize_city(city), city)
+
+        return list(distinct.values())
+
     def run(self, query):
-        """Fetches weather data for a given city"""
-        if not query or not query.strip():
+        """Fetches weather data for a city, or for a list of cities concurrently"""
+        cities = self.parse_cities(query)
+        if not cities:
             return "Error: City name cannot be empty."
+        if len(cities) > self.max_cities:
+            return f"Error: At most {self.max_cities} cities can be looked up at once."
 
-        url = f"{self.base_url}?q={query}&appid={self.api_key}&units=metric"
-        # print('###### weather url : ', url)
+        if len(cities) == 1:
+            return self.describe(cities[0])
 
-        try:
-            response = requests.get(url, timeout=5)
+        return self.combine(cities, list(self.executor.map(lambda city: self.describe(city, compact=True), cities)))
+
+    async def arun(self, query):
+        """Fetches weather data for a city, or for a list of cities concurrently, without blocking the event loop"""
+        cities = self.parse_cities(query)
+        if not cities:
+            return "Error: City name cannot be empty."
+        if len(cities) > self.max_cities:
+            return f"Error: At most {self.max_cities} cities can be looked up at once."
 
-            # ✅ Checking HTTP status manually
-            if response.status_code != 200:
-                return f"Error: Unable to fetch weather data. Server responded with {response.status_code}: {response.json().get('message', 'Unknown error')}"
+        if len(cities) == 1:
+            return await self.adescribe(cities[0])
 
-            data = response.json()
+        return self.combine(cities, await asyncio.gather(*[self.adescribe(city, compact=True) for city in cities]))
 
-            # ✅ Ensuring response contains required data
-            if "main" not in data or "weather" not in data:
-                return f"Could not find weather data for '{query}'. Please check the city name."
+    def describe(self, city, compact=False):
+        try:
+            status_code, data = self.fetch(city)
+            return self.format_weather(city, status_code, data, compact)
 
-            temperature = data["main"]["temp"]
-            description = data["weather"][0]["description"]
-            humidity = data["main"]["humidity"]
-            wind_speed = data["wind"]["speed"]
+        except (httpx.HTTPError, ValueError) as req_err:
+            # ValueError: a body that is not JSON, e.g. a proxy's HTML error page
+            return f"Request failed: {str(req_err)}"
 
-            return f"The temperature in {query} is {temperature}°C. " f"The weather is {description}. " f"The humidity is {humidity}%. " f"The wind speed is {wind_speed} m/s."
+    async def adescribe(self, city, compact=False):
+        try:
+            status_code, data = await self.afetch(city)
+            return self.format_weather(city, status_code, data, compact)
 
-        except requests.exceptions.RequestException as req_err:
+        except (httpx.HTTPError, ValueError) as req_err:
+            # ValueError: a body that is not JSON, e.g. a proxy's HTML error page
             return f"Request failed: {str(req_err)}"
 
+    def combine(self, cities, reports):
+        """Joins per-city reports into one observation, an error only if every city failed; ToolCache does not cache it while any city failed"""
+        lines = [report if compact_line(report) else f"{city}: {report}" for city, report in zip(cities, reports)]
+        combined = "\n".join(lines)
+
+        return combined if any(compact_line(report) for report in reports) else f"Error: {combined}"
+
+    def request(self, city):
+        response = self.http.get("weather", self.base_url, params={"q": city, "appid": self.api_key, "units": "metric"})
+        return response.status_code, response.json()
+
+    async def arequest(self, city):
+        response = await self.http.aget("weather", self.base_url, params={"q": city, "appid": self.api_key, "units": "metric"})
+        return response.status_code, response.json()
+
+    def fetch(self, city):
+        """Returns (status_code, data) for a city, sharing one upstream request between concurrent callers asking for the same city"""
+        key = self.normalize_city(city)
+
+        with self.lock:
+            future = self.in_flight.get(key)
+            leader = future is None
+            if leader:
+                future = self.in_flight[key] = Future()
+            else:
+                self.coalesced += 1
+
+        if leader:
+            try:
+                future.set_result(self.request(city))
+            except Exception as e:
+                future.set_exception(e)
+            finally:
+                with self.lock:
+                    del self.in_flight[key]
+
+        return future.result()
+
+    async def afetch(self, city):
+        """Returns (status_code, data) for a city, sharing one upstream request between concurrent tasks asking for the same city"""
+        key = self.normalize_city(city)
+        task = self.async_in_flight.get(key)
+
+        if task is None:
+            task = self.async_in_flight[key] = asyncio.ensure_future(self.arequest(city))
+            task.add_done_callback(lambda _: self.async_in_flight.pop(key, None))
+        else:
+            self.coalesced += 1
+
+        # One caller giving up must not cancel the request for the others
+        return await asyncio.shield(task)
+
+    def format_weather(self, query, status_code, data, compact=False):
+        """Turns an OpenWeather response into a readable observation, or a one-line summary when compact"""
+        # ✅ Checking HTTP status manually
+        if status_code != 200:
+            return f"Error: Unable to fetch weather data. Server responded with {status_code}: {data.get('message', 'Unknown error')}"
+
+        # ✅ Ensuring response contains required data
+        if "main" not in data or "weather" not in data:
+            return f"Could not find weather data for '{query}'. Please check the city name."
+
+        temperature = data["main"]["temp"]
+        description = data["weather"][0]["description"]
+        humidity = data["main"]["humidity"]
+        wind_speed = data["wind"]["speed"]
+
+        if compact:
+            return f"{query}: {temperature}°C, {description}, humidity {humidity}%, wind {wind_speed} m/s"
+
+        return f"The temperature in {query} is {temperature}°C. " f"The weather is {description}. " f"The humidity is {humidity}%. " f"The wind speed is {wind_speed} m/s."
+
+
+def compact_line(report):
+    return not report.startswith(ERROR_PREFIXES)
+
 
 # === For standalone testing ===
 if __name__ == "__main__":
 
     weather_tool = WeatherTool()
-    city = "Dhaka"
 
-    result = weather_tool.run(city)
-    print(result)
+    for query in ["Dhaka", '["Dhaka", "Tokyo", "dhaka"]']:
+        result = weather_tool.run(query)
+        print(result)
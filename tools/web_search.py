@@ -1,59 +1,181 @@
+import asyncio
+import json
 import os
+import re
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import parse_qsl, urlencode, urlsplit
 
 from dotenv import load_dotenv
-from tavily import TavilyClient
 
-from .base_tool import BaseTool
+from utils.http import HttpTransport
+from utils.text import terms
 
+from .base_tool import BaseTool, tool_metadata
 
-class WebSearchTool(BaseTool):
-    """A tool for performing web searches using the Tavily API."""
 
-    def __init__(self):
-        load_dotenv()
-        super().__init__(
-            name="web_search",
-            description="Search the web for information. Input is a query. e.g. 'Champion of the 2024 Champions League'.",
-        )
+class TavilyBackend:
+    """Searches the web through the Tavily API."""
+
+    def __init__(self, http):
+        from tavily import AsyncTavilyClient, TavilyClient
 
         self.api_key = os.getenv("TAVILY_API_KEY")
         if not self.api_key:
             raise ValueError("Missing API Key: Please set 'TAVILY_API_KEY' in the .env file.")
 
-        self.tavily_client = TavilyClient(api_key=self.api_key)
+        self.tavily_client = TavilyClient(api_key=self.api_key, api_base_url=http.base_url("tavily", None), session=http.session("tavily"))
+        self.async_tavily_client = AsyncTavilyClient(api_key=self.api_key, client=http.async_client("tavily"))
+
+    def search(self, query, max_results):
+        return self.tavily_client.search(query=query, max_results=max_results)
+
+    async def asearch(self, query, max_results):
+        return await self.async_tavily_client.search(query=query, max_results=max_results)
+
+
+class LocalSearchBackend:
+    """Searches a local JSON list of {"title", "url", "content"} documents by term overlap, e.g. to run tests offline."""
+
+    def __init__(self, path=None, documents=None):
+        if documents is None:
+            with open(path, "r") as file:
+                documents = json.load(file)
+
+        self.documents = [(document, terms(f"{document.get('title', '')} {document.get('content', '')}")) for document in documents]
+
+    def search(self, query, max_results):
+        query_terms = terms(query)
+        scored = [(len(query_terms & document_terms) / len(query_terms), document) for document, document_terms in self.documents if query_terms & document_terms]
+        scored.sort(key=lambda item: -item[0])
+
+        return {"results": [dict(document, score=round(score, 4)) for score, document in scored[:max_results]]}
+
+    async def asearch(self, query, max_results):
+        return self.search(query, max_results)
+
+
+def normalize_url(url):
+    """Reduce a URL to the form two links to the same page share: no scheme, www, fragment, trailing slash or tracking parameters."""
+    parts = urlsplit(url.strip().lower())
+    query = urlencode([(key, value) for key, value in parse_qsl(parts.query) if not key.startswith("utm_")])
+    return re.sub(r"^www\.", "", parts.netloc) + parts.path.rstrip("/") + (f"?{query}" if query else "")
+
+
+def shingles(text, size=3):
+    words = re.findall(r"\w+", text.lower())
+    return {tuple(words[i : i + size]) for i in range(max(len(words) - size + 1, 1))}
+
+
+class WebSearchTool(BaseTool):
+    """A tool for performing web searches, through the Tavily API unless another backend is given."""
+
+    def __init__(self, http=None, backend=None):
+        load_dotenv()
+        super().__init__(**tool_metadata("web_search"))
+        self.max_results = 2
+        self.max_queries = 4
+        self.max_content_chars = 1500
+        self.similarity = 0.6
+
+        self.http = http or HttpTransport()
+        if backend is None and os.getenv("WEB_SEARCH_INDEX"):
+            backend = LocalSearchBackend(os.getenv("WEB_SEARCH_INDEX"))
+        self.backend = backend or TavilyBackend(self.http)
+        self.executor = ThreadPoolExecutor(max_workers=self.max_queries)
+
+    def parse_queries(self, query):
+        """Return the distinct sub-queries of an input: a plain query, a JSON list of queries or {"queries": [...]}."""
+        try:
+            data = json.loads(query)
+        except (TypeError, ValueError):
+            data = query
+
+        if isinstance(data, dict):
+            data = data.get("queries", data.get("query", ""))
+        queries = data if isinstance(data, list) else [data]
+
+        return list(dict.fromkeys(str(item).strip() for item in queries if str(item).strip()))
 
     def run(self, query: str) -> list:
-        """Performs a web search for a given query and returns structured results as a list of dictionaries."""
-        if not query or not query.strip():
+        """Searches every sub-query concurrently and returns the merged results as a list of dictionaries."""
+        queries = self.parse_queries(query)
+        if not queries:
             return [{"error": "Query cannot be empty."}]
+        if len(queries) > self.max_queries:
+            return [{"error": f"At most {self.max_queries} queries can be searched at once."}]
 
-        try:
-            search_results = self.tavily_client.search(query=query, max_results=2)
+        return self.merge_results(list(self.executor.map(self.search, queries)))
 
-            # Validate response structure
-            if not search_results or "results" not in search_results:
-                return [{"error": "No search results available."}]
+    async def arun(self, query: str) -> list:
+        """Searches every sub-query concurrently without blocking the event loop."""
+        queries = self.parse_queries(query)
+        if not queries:
+            return [{"error": "Query cannot be empty."}]
+        if len(queries) > self.max_queries:
+            return [{"error": f"At most {self.max_queries} queries can be searched at once."}]
 
-            formatted_results = []
-            for result in search_results["results"]:
-                formatted_result = {
-                    "title": result.get("title", "No title available"),
-                    "content": result.get("content", "No content available"),
-                    "url": result.get("url", "No URL available"),
-                    "score": result.get("score", "No score available"),
-                }
-                formatted_results.append(formatted_result)
+        return self.merge_results(await asyncio.gather(*[self.asearch(sub_query) for sub_query in queries]))
 
-            return formatted_results if formatted_results else [{"error": "No results found."}]
+    def search(self, query):
+        try:
+            return self.format_results(self.backend.search(query, self.max_results))
+        except Exception as e:
+            return [{"error": f"Search request failed: {str(e)}"}]
 
+    async def asearch(self, query):
+        try:
+            return self.format_results(await self.backend.asearch(query, self.max_results))
         except Exception as e:
             return [{"error": f"Search request failed: {str(e)}"}]
 
+    def format_results(self, search_results):
+        """Converts a search response into a list of result dictionaries."""
+        # Validate response structure
+        if not search_results or "results" not in search_results:
+            return [{"error": "No search results available."}]
+
+        formatted_results = []
+        for result in search_results["results"]:
+            formatted_result = {
+                "title": result.get("title", "No title available"),
+                "content": result.get("content", "No content available"),
+                "url": result.get("url", "No URL available"),
+                "score": result.get("score", 0.0),
+            }
+            formatted_results.append(formatted_result)
+
+        return formatted_results if formatted_results else [{"error": "No results found."}]
+
+    def merge_results(self, result_lists):
+        """Merge the results of several searches: best score first, without repeated pages or near-identical content, within the content budget."""
+        results = [result for results in result_lists for result in results if "error" not in result]
+        if not results:
+            # Every search failed, report the first error
+            return result_lists[0]
+
+        merged, seen_urls, seen_shingles = [], set(), []
+        budget = self.max_content_chars
+
+        for result in sorted(results, key=lambda result: -float(result["score"] or 0)):
+            url, content_shingles = normalize_url(result["url"]), shingles(result["content"])
+            if url in seen_urls or any(len(content_shingles & other) / len(content_shingles | other) >= self.similarity for other in seen_shingles):
+                continue
+
+            if budget <= 0:
+                break
+
+            seen_urls.add(url)
+            seen_shingles.append(content_shingles)
+            merged.append(dict(result, content=result["content"][:budget]))
+            budget -= len(merged[-1]["content"])
+
+        return merged
+
 
 # === For standalone testing ===
 if __name__ == "__main__":
 
-    queries = ["F1 winner 2024"]
+    queries = ["F1 winner 2024", '["2024 Nobel Prize in Physics winners", "Geoffrey Hinton birthplace"]']
     web_search_tool = WebSearchTool()
 
     for query in queries:
@@ -1,23 +1,60 @@
+import os
+
 import wikipediaapi
+from colorama import Fore, Style
+
+from utils.http import HttpTransport
+from utils.wiki_index import WikiIndex
 
-from .base_tool import BaseTool
+from .base_tool import BaseTool, run_in_thread, tool_metadata
 
 
 class WikipediaTool(BaseTool):
     """A tool for fetching Wikipedia summaries."""
 
-    def __init__(self, language="en", user_agent="ReAct Agent from Scratch"):
-        super().__init__(
-            name="wikipedia",
-            description="Gets information from a Wikipedia entry. Specific Wikipedia input. e.g. 'Albert Einstein'.",
-        )
-        self.wiki_api = wikipediaapi.Wikipedia(user_agent=user_agent, language=language)
+    def __init__(self, language="en", user_agent="ReAct Agent from Scratch", http=None, index_dir=None, log=print):
+        super().__init__(**tool_metadata("wikipedia"))
+        self.http = http or HttpTransport()
+        self.wiki_api = wikipediaapi.Wikipedia(user_agent=user_agent, language=language, transport=self.http.transport("wikipedia"), timeout=self.http.timeout, max_retries=self.http.retries)
+
+        # Offline index built from an abstracts dump, the live API is only used for titles it doesn't have
+        index_dir = index_dir or os.getenv("WIKIPEDIA_INDEX")
+        self.index = None
+        if index_dir:
+            try:
+                self.index = WikiIndex(index_dir)
+            except (ValueError, OSError) as e:
+                # A missing or half-built index must not take the live API down with it
+                log(f"\n{Fore.YELLOW}[WARNING] Wikipedia index unavailable, using the live API only: {e}{Style.RESET_ALL}\n")
 
     def run(self, query: str) -> dict:
         """Fetches summary information from Wikipedia for a given topic."""
         if not query or not query.strip():
             return {"error": "Query cannot be empty."}
 
+        return self.lookup_index(query) or self.closest_match(query, self.fetch_page(query))
+
+    async def arun(self, query: str) -> dict:
+        """Serves index hits on the event loop and only moves live API requests to a worker thread."""
+        if not query or not query.strip():
+            return {"error": "Query cannot be empty."}
+
+        return self.lookup_index(query) or self.closest_match(query, await run_in_thread(self.fetch_page, query))
+
+    def lookup_index(self, query, exact=True):
+        """Returns the summary from the offline index for the title or one of its redirects, or with exact off its closest title, or None."""
+        match = self.index.lookup(query, exact) if self.index else None
+        return {"query": query, "title": match[0], "summary": match[1]} if match else None
+
+    def closest_match(self, query, result):
+        """Falls back on the index's closest title, a prefix or misspelling match, only when the live API has no page for the query or cannot be reached."""
+        if "error" in result:
+            return self.lookup_index(query, exact=False) or result
+
+        return result
+
+    def fetch_page(self, query):
+        """Fetches the summary from the live Wikipedia API."""
         try:
             page = self.wiki_api.page(query)
 
@@ -0,0 +1,155 @@
+import random
+import re
+import threading
+import time
+import zlib
+from collections import OrderedDict
+
+from utils.text import STOPWORDS
+
+MERSENNE_PRIME = (1 << 61) - 1
+# Sentence punctuation and quotes, and periods that are not decimal points; operators and signs are kept
+SENTENCE_PUNCTUATION = re.compile(r"[?!,;:\"`\u201c\u201d]|(?<!\d)\.|\.(?!\d)")
+OPERATOR = re.compile(r"([-+*/^<>=%()])")
+
+
+class AnswerCache:
+    """LRU cache of final answers keyed by normalized query, with optional near-duplicate matching through MinHash LSH."""
+
+    def __init__(self, max_entries=1024, similarity=None, num_perm=64, bands=16, ngram=3):
+        """
+        :param max_entries: Answers kept before the least recently used ones are evicted.
+        :param similarity: Minimum Jaccard similarity of character n-grams for a near-duplicate hit, or None for exact matches only.
+            Near-duplicates must also share the same content words, so "weather in Paris" never matches "weather in Perth".
+        :param num_perm: Number of MinHash permutations, split into bands of num_perm // bands rows for the LSH index.
+        :param ngram: Length of the character n-grams compared.
+        """
+        self.max_entries = max_entries
+        self.similarity = similarity
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.ngram = ngram
+        generator = random.Random(1)
+        self.permutations = [(generator.randrange(1, MERSENNE_PRIME), generator.randrange(MERSENNE_PRIME)) for _ in range(num_perm)]
+        self.entries = OrderedDict()
+        self.buckets = {}
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.similar_hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def normalize(query):
+        """Fold case, whitespace and sentence punctuation so that trivially different spellings share an entry.
+
+        Operators, comparison signs and minus signs are kept as tokens, so "(2+3)*4" and "(2*3)-4" or "5 > 3" and "5 < 3" never share a key.
+        """
+        text = re.sub(r"['\u2018\u2019]", "", query.lower())
+        text = OPERATOR.sub(r" \1 ", SENTENCE_PUNCTUATION.sub(" ", text))
+        return " ".join(text.split())
+
+    @staticmethod
+    def keywords(normalized):
+        """Return the content words and numbers of a normalized query, plus its numbers and operators in order as one item."""
+        tokens = normalized.split()
+        expression = "".join(token for token in tokens if OPERATOR.fullmatch(token) or re.fullmatch(r"[\d.]+", token))
+
+        return frozenset([word for word in tokens if word not in STOPWORDS and not OPERATOR.fullmatch(word)] + [f"expression:{expression}"])
+
+    def shingles(self, normalized):
+        padded = f" {normalized} "
+        return {padded[i : i + self.ngram] for i in range(max(len(padded) - self.ngram + 1, 1))}
+
+    def signature(self, shingles):
+        """Return the MinHash signature of a set of shingles."""
+        hashes = [zlib.crc32(shingle.encode()) for shingle in shingles]
+        return [min((a * h + b) % MERSENNE_PRIME for h in hashes) for a, b in self.permutations]
+
+    def band_keys(self, signature):
+        return [(band, tuple(signature[band * self.rows : (band + 1) * self.rows])) for band in range(self.bands)]
+
+    def get(self, query):
+        """Return (match, answer) where match is "exact", "similar" or None when there is no fresh cached answer."""
+        normalized = self.normalize(query)
+        now = time.time()
+
+        with self.lock:
+            entry = self.entries.get(normalized)
+            if entry and entry["expires_at"] > now:
+                self.entries.move_to_end(normalized)
+                self.hits += 1
+                return "exact", entry["answer"]
+
+            if entry:
+                self.remove(normalized)
+
+            key = self.find_similar(normalized, now) if self.similarity else None
+            if key:
+                self.entries.move_to_end(key)
+                self.similar_hits += 1
+                return "similar", self.entries[key]["answer"]
+
+            self.misses += 1
+            return None, None
+
+    def find_similar(self, normalized, now):
+        """Return the key of the most similar fresh entry above the similarity threshold, or None. Caller must hold the lock."""
+        shingles = self.shingles(normalized)
+        keywords = self.keywords(normalized)
+        candidates = set()
+
+        for band_key in self.band_keys(self.signature(shingles)):
+            candidates |= self.buckets.get(band_key, set())
+
+        best_key, best_similarity = None, self.similarity
+        for key in candidates:
+            entry = self.entries[key]
+
+            # Queries that differ in a content word or number, such as "15% of 80" and "15% of 90", are not duplicates
+            if entry["expires_at"] <= now or entry["keywords"] != keywords:
+                continue
+
+            similarity = len(shingles & entry["shingles"]) / len(shingles | entry["shingles"])
+            if similarity >= best_similarity:
+                best_key, best_similarity = key, similarity
+
+        return best_key
+
+    def set(self, query, answer, ttl):
+        """Cache an answer for ttl seconds."""
+        if not ttl:
+            return
+
+        normalized = self.normalize(query)
+
+        with self.lock:
+            if normalized in self.entries:
+                self.remove(normalized)
+
+            entry = {"answer": answer, "expires_at": time.time() + ttl}
+            if self.similarity:
+                entry["keywords"] = self.keywords(normalized)
+                entry["shingles"] = self.shingles(normalized)
+                entry["band_keys"] = self.band_keys(self.signature(entry["shingles"]))
+                for band_key in entry["band_keys"]:
+                    self.buckets.setdefault(band_key, set()).add(normalized)
+
+            self.entries[normalized] = entry
+
+            while len(self.entries) > self.max_entries:
+                self.remove(next(iter(self.entries)))
+
+    def remove(self, key):
+        """Remove an entry and its LSH buckets. Caller must hold the lock."""
+        entry = self.entries.pop(key)
+
+        for band_key in entry.get("band_keys", []):
+            bucket = self.buckets[band_key]
+            bucket.discard(key)
+            if not bucket:
+                del self.buckets[band_key]
+
+    def stats(self):
+        """Return hit/miss counters for reporting."""
+        with self.lock:
+            return {"hits": self.hits, "similar_hits": self.similar_hits, "misses": self.misses, "entries": len(self.entries)}
@@ -0,0 +1,52 @@
+import time
+
+
+class QueryBudget:
+    """Per-query limits on wall-clock time, LLM tokens and tool calls."""
+
+    def __init__(self, deadline=None, max_tokens=None, max_tool_calls=None):
+        """
+        :param deadline: Seconds the query may run for, or None for no limit.
+        :param max_tokens: Total prompt and completion tokens the query may use, or None for no limit.
+        :param max_tool_calls: Number of tool calls the query may make, or None for no limit.
+        """
+        self.started_at = time.monotonic()
+        self.deadline = self.started_at + deadline if deadline else None
+        self.max_tokens = max_tokens
+        self.max_tool_calls = max_tool_calls
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        self.cached_tokens = 0
+        self.llm_calls = 0
+        self.tool_calls = 0
+
+    @property
+    def tokens_used(self):
+        return self.prompt_tokens + self.completion_tokens
+
+    def remaining_time(self):
+        """Seconds left before the deadline, or None when there is no deadline."""
+        if self.deadline is None:
+            return None
+
+        return max(self.deadline - time.monotonic(), 0.0)
+
+    def add_usage(self, prompt_tokens, completion_tokens, cached_tokens=0):
+        self.prompt_tokens += prompt_tokens
+        self.completion_tokens += completion_tokens
+        self.cached_tokens += cached_tokens
+        self.llm_calls += 1
+
+    def add_tool_calls(self, count=1):
+        self.tool_calls += count
+
+    def exhausted(self):
+        """Return the name of the first exhausted limit, or None while the query is within budget."""
+        if self.deadline is not None and time.monotonic() >= self.deadline:
+            return "deadline"
+        if self.max_tokens is not None and self.tokens_used >= self.max_tokens:
+            return "tokens"
+        if self.max_tool_calls is not None and self.tool_calls >= self.max_tool_calls:
+            return "tool_calls"
+
+        return None
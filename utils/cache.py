@@ -0,0 +1,126 @@
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+ERROR_PREFIXES = ("Error", "Request failed", "Could not find")
+
+
+class ToolCache:
+    """LRU cache for tool results with per-entry TTL and an optional SQLite tier shared across processes."""
+
+    def __init__(self, max_entries=256, db_path=None, max_disk_entries=10000, prune_interval=100):
+        """
+        :param max_entries: Results kept in memory, least recently used evicted first.
+        :param db_path: Optional SQLite file for a tier shared across processes.
+        :param max_disk_entries: Rows kept in the SQLite tier, those expiring first are deleted beyond it.
+        :param prune_interval: Writes between two deletions of expired and excess rows.
+        """
+        self.max_entries = max_entries
+        self.max_disk_entries = max_disk_entries
+        self.prune_interval = prune_interval
+        self.writes = 0
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.db = None
+
+        if db_path:
+            self.db = sqlite3.connect(db_path, timeout=5, check_same_thread=False)
+            self.db.execute("PRAGMA journal_mode=WAL")
+            self.db.execute("CREATE TABLE IF NOT EXISTS tool_cache (key TEXT PRIMARY KEY, value TEXT, expires_at REAL)")
+            self.db.execute("CREATE INDEX IF NOT EXISTS tool_cache_expires_at ON tool_cache (expires_at)")
+            self.prune()
+            self.db.commit()
+
+    @staticmethod
+    def make_key(tool_name, query):
+        """Normalize a query so that trivially different spellings share an entry."""
+        try:
+            normalized = json.dumps(json.loads(query), sort_keys=True)
+        except (TypeError, ValueError):
+            normalized = " ".join(str(query).lower().split())
+
+        return f"{tool_name}:{normalized}"
+
+    @staticmethod
+    def is_error(result):
+        """Return True for tool outputs that report an error and must not be cached."""
+        if isinstance(result, dict):
+            return "error" in result
+        if isinstance(result, list):
+            return not result or any(isinstance(item, dict) and "error" in item for item in result)
+
+        return str(result).startswith(ERROR_PREFIXES)
+
+    @staticmethod
+    def is_partial(result):
+        """Return True for a combined result, one "name: output" line per part such as a city, in which some part failed."""
+        return isinstance(result, str) and any(line.split(": ", 1)[-1].startswith(ERROR_PREFIXES) for line in result.splitlines())
+
+    def get(self, tool_name, query):
+        """Return (True, result) for a fresh cached result, otherwise (False, None)."""
+        key = self.make_key(tool_name, query)
+        now = time.time()
+
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry and entry[1] > now:
+                self.entries.move_to_end(key)
+                self.hits += 1
+                return True, entry[0]
+
+            self.entries.pop(key, None)
+
+            if self.db:
+                row = self.db.execute("SELECT value, expires_at FROM tool_cache WHERE key = ?", (key,)).fetchone()
+                if row and row[1] > now:
+                    result = json.loads(row[0])
+                    self.store(key, result, row[1])
+                    self.disk_hits += 1
+                    return True, result
+                if row:
+                    self.db.execute("DELETE FROM tool_cache WHERE key = ? AND expires_at <= ?", (key, now))
+                    self.db.commit()
+
+            self.misses += 1
+            return False, None
+
+    def set(self, tool_name, query, result, ttl):
+        """Cache a successful tool result for ttl seconds. A result with a failed part is not cached, so one failure is not served for the whole TTL."""
+        if not ttl or self.is_error(result) or self.is_partial(result):
+            return
+
+        key = self.make_key(tool_name, query)
+        expires_at = time.time() + ttl
+
+        with self.lock:
+            self.store(key, result, expires_at)
+
+            if self.db:
+                self.db.execute("INSERT OR REPLACE INTO tool_cache (key, value, expires_at) VALUES (?, ?, ?)", (key, json.dumps(result), expires_at))
+                self.writes += 1
+                if self.writes % self.prune_interval == 0:
+                    self.prune()
+                self.db.commit()
+
+    def prune(self):
+        """Delete expired rows from the SQLite tier, then the rows expiring first beyond max_disk_entries. Caller must hold the lock."""
+        self.db.execute("DELETE FROM tool_cache WHERE expires_at <= ?", (time.time(),))
+        self.db.execute("DELETE FROM tool_cache WHERE key IN (SELECT key FROM tool_cache ORDER BY expires_at DESC LIMIT -1 OFFSET ?)", (self.max_disk_entries,))
+
+    def store(self, key, result, expires_at):
+        """Insert an entry in memory, evicting the least recently used ones. Caller must hold the lock."""
+        self.entries[key] = (result, expires_at)
+        self.entries.move_to_end(key)
+
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+
+    def stats(self):
+        """Return hit/miss counters for reporting."""
+        with self.lock:
+            return {"hits": self.hits, "disk_hits": self.disk_hits, "misses": self.misses, "entries": len(self.entries)}
@@ -0,0 +1,12 @@
+class AgentEvent:
+    """A structured step of the agent loop: "token", "thought", "action", "observation", "final_answer" or "done"."""
+
+    __slots__ = ("type", "content", "data")
+
+    def __init__(self, type, content, data=None):
+        self.type = type
+        self.content = content
+        self.data = data or {}
+
+    def __repr__(self):
+        return f"AgentEvent({self.type!r}, {self.content!r})"
@@ -0,0 +1,153 @@
+import asyncio
+import random
+import threading
+import time
+
+import httpx
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+
+class StubTransport(httpx.BaseTransport):
+    """Redirects every request of a client to a local stub server, keeping the path and query."""
+
+    def __init__(self, transport, base_url):
+        self.transport = transport
+        self.base_url = httpx.URL(base_url)
+
+    def handle_request(self, request):
+        request.url = request.url.copy_with(scheme=self.base_url.scheme, host=self.base_url.host, port=self.base_url.port)
+        return self.transport.handle_request(request)
+
+    def close(self):
+        self.transport.close()
+
+
+class AsyncStubTransport(httpx.AsyncBaseTransport):
+    """Asynchronous counterpart of StubTransport."""
+
+    def __init__(self, transport, base_url):
+        self.transport = transport
+        self.base_url = httpx.URL(base_url)
+
+    async def handle_async_request(self, request):
+        request.url = request.url.copy_with(scheme=self.base_url.scheme, host=self.base_url.host, port=self.base_url.port)
+        return await self.transport.handle_async_request(request)
+
+    async def aclose(self):
+        await self.transport.aclose()
+
+
+class HttpTransport:
+    """Shared keep-alive HTTP connection pools for tools, with per-host limits, retries with jittered backoff and timeouts."""
+
+    def __init__(self, max_connections_per_host=10, retries=2, backoff=0.5, timeout=5.0, base_urls=None):
+        """
+        :param max_connections_per_host: Connections each named client may keep open to its host.
+        :param retries: Retries for connection errors, timeouts and 429/5xx responses.
+        :param backoff: Base delay in seconds, doubled on every retry and randomized by +/- 50%.
+        :param timeout: Default timeout in seconds for a single request.
+        :param base_urls: Optional {client name: base url} of local stub servers to send requests to instead.
+        """
+        self.max_connections_per_host = max_connections_per_host
+        self.retries = retries
+        self.backoff = backoff
+        self.timeout = timeout
+        self.base_urls = base_urls or {}
+        self.clients = {}
+        self.async_clients = {}
+        self.sessions = {}
+        self.lock = threading.Lock()
+
+    def limits(self):
+        return httpx.Limits(max_connections=self.max_connections_per_host, max_keepalive_connections=self.max_connections_per_host)
+
+    def transport(self, name):
+        """Return a new pooled httpx transport for the named client, for libraries that build their own httpx.Client."""
+        transport = httpx.HTTPTransport(limits=self.limits(), retries=self.retries)
+        return StubTransport(transport, self.base_urls[name]) if name in self.base_urls else transport
+
+    def async_transport(self, name):
+        """Return a new pooled async httpx transport for the named client."""
+        transport = httpx.AsyncHTTPTransport(limits=self.limits(), retries=self.retries)
+        return AsyncStubTransport(transport, self.base_urls[name]) if name in self.base_urls else transport
+
+    def client(self, name):
+        """Return the shared httpx.Client for a name, usually one per upstream host."""
+        with self.lock:
+            if name not in self.clients:
+                self.clients[name] = httpx.Client(transport=self.transport(name), timeout=self.timeout)
+            return self.clients[name]
+
+    def async_client(self, name):
+        """Return the shared httpx.AsyncClient for a name, usually one per upstream host."""
+        with self.lock:
+            if name not in self.async_clients:
+                self.async_clients[name] = httpx.AsyncClient(transport=self.async_transport(name), timeout=self.timeout)
+            return self.async_clients[name]
+
+    def session(self, name):
+        """Return the shared requests.Session for a name, for libraries that only accept a requests session."""
+        with self.lock:
+            if name not in self.sessions:
+                retry = Retry(total=self.retries, backoff_factor=self.backoff, backoff_jitter=self.backoff, status_forcelist=RETRY_STATUSES, allowed_methods=None, raise_on_status=False)
+                adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.max_connections_per_host, pool_block=True, max_retries=retry)
+                session = requests.Session()
+                session.mount("http://", adapter)
+                session.mount("https://", adapter)
+                self.sessions[name] = session
+            return self.sessions[name]
+
+    def base_url(self, name, default):
+        """Return the stub server base url configured for a name, or the default upstream url."""
+        return self.base_urls.get(name, default)
+
+    def backoff_delay(self, attempt):
+        return self.backoff * (2**attempt) * random.uniform(0.5, 1.5)
+
+    def get(self, name, url, params=None, timeout=None):
+        """GET with the named client, retrying connection errors, timeouts and 429/5xx responses."""
+        for attempt in range(self.retries + 1):
+            try:
+                response = self.client(name).get(url, params=params, timeout=timeout or self.timeout)
+                if response.status_code not in RETRY_STATUSES or attempt == self.retries:
+                    return response
+            except httpx.TransportError:
+                if attempt == self.retries:
+                    raise
+
+            time.sleep(self.backoff_delay(attempt))
+
+    async def aget(self, name, url, params=None, timeout=None):
+        """Asynchronous counterpart of get."""
+        for attempt in range(self.retries + 1):
+            try:
+                response = await self.async_client(name).get(url, params=params, timeout=timeout or self.timeout)
+                if response.status_code not in RETRY_STATUSES or attempt == self.retries:
+                    return response
+            except httpx.TransportError:
+                if attempt == self.retries:
+                    raise
+
+            await asyncio.sleep(self.backoff_delay(attempt))
+
+    def close(self):
+        """Close every pooled connection of the sync clients and sessions; the async clients are closed by aclose."""
+        for client in self.clients.values():
+            client.close()
+        for session in self.sessions.values():
+            session.close()
+
+    async def aclose(self):
+        """Close the pooled connections of the async clients, on the event loop that used them.
+
+        The clients are dropped, so a later event loop gets new ones instead of connections bound to a closed loop.
+        """
+        with self.lock:
+            clients, self.async_clients = list(self.async_clients.values()), {}
+
+        for client in clients:
+            await client.aclose()
@@ -1,4 +1,10 @@
 class Message:
-    def __init__(self, role, content):
+    __slots__ = ("role", "content", "tokens", "id", "tool_calls", "tool_call_id")
+
+    def __init__(self, role, content, tokens=0, id=None, tool_calls=None, tool_call_id=None):
         self.role = role
         self.content = content
+        self.tokens = tokens  # Token count of the content, computed once when the message is created
+        self.id = id  # Row of the message in the session store, if the conversation is persisted
+        self.tool_calls = tool_calls  # Native function calls of an assistant message, as the API returned them
+        self.tool_call_id = tool_call_id  # Native function call an observation answers
@@ -0,0 +1,110 @@
+import re
+
+from utils.text import terms
+
+# Fields that cost tokens without helping the model answer
+OMITTED_FIELDS = {"score", "raw_content", "images", "response_time"}
+
+# The "title: " or "[1] title: A | content: " labels that serialize puts in front of a value
+LABEL_PREFIX = re.compile(r"^(?:\[\d+\] )?(?:\w+: [^|]*\| )*\w+: ")
+
+
+class ObservationCompressor:
+    """Turns tool results into compact text and trims them to a token budget, keeping the sentences most relevant to the query."""
+
+    def __init__(self, count_tokens):
+        """
+        :param count_tokens: Callable returning the number of tokens in a text, normally the agent's tokenizer.
+        """
+        self.count_tokens = count_tokens
+
+    def serialize(self, result, query=""):
+        """Render a tool result as plain lines instead of a Python repr, dropping empty fields, noise fields and echoes of the query."""
+        if isinstance(result, str):
+            return result.strip()
+
+        if isinstance(result, dict):
+            fields = [(key, value) for key, value in result.items() if key not in OMITTED_FIELDS and value not in (None, "", [], {}) and str(value).strip() != query.strip()]
+            return "\n".join(f"{key}: {self.serialize(value, query)}" for key, value in fields)
+
+        if isinstance(result, (list, tuple)):
+            if len(result) == 1:
+                return self.serialize(result[0], query)
+            return "\n".join(f"[{index}] " + self.serialize(item, query).replace("\n", " | ") for index, item in enumerate(result, start=1))
+
+        return str(result)
+
+    def cut(self, sentence, max_tokens):
+        """Shorten a sentence to at most max_tokens, cutting it at a word boundary."""
+        words = sentence.split(" ")
+        keep = max(len(words) * max_tokens // max(self.count_tokens(sentence), 1), 1)
+
+        while keep > 1 and self.count_tokens(" ".join(words[:keep]) + " …") > max_tokens:
+            keep = keep * 9 // 10
+
+        # A single unbroken word is cut by characters
+        text = " ".join(words[:keep])
+        if self.count_tokens(text) > max_tokens:
+            text = text[: len(text) * max_tokens // max(self.count_tokens(text), 1)]
+
+        return text.rstrip() + " …"
+
+    def trim(self, text, query, max_tokens):
+        """Shorten text to about max_tokens by keeping its most query-relevant sentences in their original order, 0 disables trimming."""
+        return self.trim_counted(text, query, max_tokens)[0]
+
+    def trim_counted(self, text, query, max_tokens):
+        """Trim like trim and also return the number of tokens trimmed away, from the counts trimming needs anyway."""
+        if not max_tokens:
+            return text, 0
+
+        total = self.count_tokens(text)
+        if total <= max_tokens:
+            return text, 0
+
+        query_terms = terms(query)
+        sentences = []  # (line_index, position, sentence, score)
+        seen = set()
+
+        for line_index, line in enumerate(text.split("\n")):
+            for position, sentence in enumerate(re.split(r"(?<=[.!?])\s+", line.strip())):
+                key = " ".join(LABEL_PREFIX.sub("", sentence).lower().split())
+                # Search results often repeat the same sentence, keep its first occurrence only
+                if not key or key in seen:
+                    continue
+                seen.add(key)
+
+                # The lead sentence of each line, such as a title or a summary's opening, tends to be informative
+                score = len(query_terms & terms(sentence)) + (0.5 if position == 0 else 0)
+                sentences.append((line_index, position, sentence, score))
+
+        selected, skipped, used = [], [], 0
+        for sentence in sorted(sentences, key=lambda item: (-item[3], item[0], item[1])):
+            tokens = self.count_tokens(sentence[2]) + 1
+            if used + tokens <= max_tokens:
+                selected.append(sentence)
+                used += tokens
+            else:
+                skipped.append(sentence)
+
+        # Rather than drop the best sentence that did not fit, such as a long unpunctuated snippet, keep as much of it as the budget allows
+        remaining = max_tokens - used - 1
+        if skipped and (remaining >= 8 or not selected):
+            line_index, position, sentence, score = skipped[0]
+            selected.append((line_index, position, self.cut(sentence, max(remaining, 1)), score))
+            used = max_tokens
+
+        lines = {}
+        for line_index, _, sentence, _ in sorted(selected):
+            lines.setdefault(line_index, []).append(sentence)
+
+        trimmed = "\n".join(" ".join(line) for line in lines.values())
+        return (trimmed if trimmed.endswith("…") else trimmed + " …"), max(total - used, 0)
+
+    def compress(self, result, query, max_tokens, question=""):
+        """Return the compact, trimmed text of a tool result, ranking sentences by their relevance to the tool query and the user's question."""
+        return self.compress_counted(result, query, max_tokens, question)[0]
+
+    def compress_counted(self, result, query, max_tokens, question=""):
+        """Compress like compress and also return the number of tokens trimmed away."""
+        return self.trim_counted(self.serialize(result, query), f"{query} {question}", max_tokens)
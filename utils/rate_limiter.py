@@ -0,0 +1,225 @@
+import asyncio
+import collections
+import threading
+import time
+
+
+class RateLimitTimeout(TimeoutError):
+    """Raised when no request slot was granted within the caller's timeout."""
+
+
+class RateLimiter:
+    """Client-side limiter shared by all sessions, keeping LLM calls under the tokens-per-minute and requests-per-minute quotas.
+
+    Usage is tracked over a sliding one-minute window, so bursts can never exceed what the API allows in any minute.
+    Waiting requests are granted round-robin across sessions, so one busy conversation cannot starve the others.
+    Concurrency adapts to throttling: it is halved on every 429 and grows back by one after a run of successful calls.
+    """
+
+    def __init__(self, tokens_per_minute=None, requests_per_minute=None, max_concurrency=16, min_concurrency=1):
+        """
+        :param tokens_per_minute: Token quota, or None for no limit.
+        :param requests_per_minute: Request quota, or None for no limit.
+        :param max_concurrency: Upper bound for the adaptive number of requests in flight.
+        :param min_concurrency: Lower bound the concurrency is never reduced below.
+        """
+        self.tokens_per_minute = tokens_per_minute
+        self.requests_per_minute = requests_per_minute
+        self.max_concurrency = max_concurrency
+        self.min_concurrency = min_concurrency
+        self.concurrency = max_concurrency
+        self.window = []  # [timestamp, tokens, finished] per request of the last minute
+        self.window_tokens = 0
+        self.paused_until = 0.0
+        self.in_flight = 0
+        self.successes = 0
+        self.throttled = 0
+        self.queues = collections.OrderedDict()
+        self.condition = threading.Condition()
+
+    def expire(self, now):
+        """Drop the requests that finished more than a minute ago from the window. Caller must hold the lock."""
+        if not any(finished and timestamp <= now - 60 for timestamp, _, finished in self.window):
+            return
+
+        self.window = [entry for entry in self.window if not (entry[2] and entry[0] <= now - 60)]
+        self.window_tokens = sum(tokens for _, tokens, _ in self.window)
+
+    def quota_wait(self, now, cost):
+        """Return the seconds until the window has room for a request of cost tokens: 0 if it has room now, None if it must wait for a release.
+
+        Caller must hold the lock.
+        """
+        requests_over = len(self.window) + 1 - self.requests_per_minute if self.requests_per_minute else 0
+        tokens_over = self.window_tokens + cost - self.tokens_per_minute if self.tokens_per_minute else 0
+
+        if requests_over <= 0 and tokens_over <= 0:
+            return 0
+
+        # Requests in flight leave the window only a minute after they finish
+        for timestamp, tokens in sorted((timestamp, tokens) for timestamp, tokens, finished in self.window if finished):
+            requests_over -= 1
+            tokens_over -= tokens
+            if requests_over <= 0 and tokens_over <= 0:
+                return max(timestamp + 60 - now, 0.001)
+
+        return None
+
+    def try_grant(self, session, ticket, cost):
+        """Grant the ticket if it is next in the round-robin and the quotas allow it.
+
+        Returns the request's window entry when granted, otherwise the seconds to wait before trying again, or None to wait for a release.
+        Caller must hold the lock.
+        """
+        now = time.monotonic()
+        self.expire(now)
+
+        # Serve the session at the front of the rotation, oldest ticket first
+        next_session = next(iter(self.queues))
+        if (next_session, self.queues[next_session][0]) != (session, ticket):
+            return None
+
+        if now < self.paused_until:
+            return self.paused_until - now
+        if self.in_flight >= self.concurrency:
+            return None
+
+        # A request larger than the whole quota is let through once the window is empty
+        cost = min(cost, self.tokens_per_minute) if self.tokens_per_minute else 0
+        wait = self.quota_wait(now, cost)
+        if wait != 0:
+            return wait
+
+        entry = [now, cost, False]
+        self.window.append(entry)
+        self.window_tokens += cost
+        self.in_flight += 1
+
+        # Move the session to the back of the rotation
+        queue = self.queues.pop(session)
+        queue.popleft()
+        if queue:
+            self.queues[session] = queue
+
+        return entry
+
+    def enqueue(self, session):
+        ticket = object()
+        self.queues.setdefault(session, collections.deque()).append(ticket)
+        return ticket
+
+    def dequeue(self, session, ticket):
+        queue = self.queues.get(session)
+        if queue and ticket in queue:
+            queue.remove(ticket)
+            if not queue:
+                del self.queues[session]
+
+    def give_up(self, session, ticket, timeout):
+        """Leave the queue so the sessions behind are not blocked and raise RateLimitTimeout. Caller must hold the lock."""
+        self.dequeue(session, ticket)
+        self.condition.notify_all()
+        raise RateLimitTimeout(f"No rate limit slot was granted within {timeout:.1f}s")
+
+    def acquire(self, session, cost, timeout=None):
+        """Block until the session may send a request estimated at cost tokens and return its window entry, to be passed to release.
+
+        Raises RateLimitTimeout if no slot is granted within timeout seconds.
+        """
+        give_up_at = time.monotonic() + timeout if timeout is not None else None
+
+        with self.condition:
+            ticket = self.enqueue(session)
+            while True:
+                granted = self.try_grant(session, ticket, cost)
+                if isinstance(granted, list):
+                    break
+
+                if give_up_at is not None:
+                    left = give_up_at - time.monotonic()
+                    if left <= 0:
+                        self.give_up(session, ticket, timeout)
+                    granted = left if granted is None else min(granted, left)
+                self.condition.wait(timeout=granted)
+
+            # The next ticket in the rotation may be grantable now
+            self.condition.notify_all()
+
+        return granted
+
+    async def acquire_async(self, session, cost, timeout=None):
+        """Wait without blocking the event loop until the session may send a request estimated at cost tokens and return its window entry.
+
+        Raises RateLimitTimeout if no slot is granted within timeout seconds.
+        """
+        give_up_at = time.monotonic() + timeout if timeout is not None else None
+
+        with self.condition:
+            ticket = self.enqueue(session)
+
+        try:
+            while True:
+                with self.condition:
+                    granted = self.try_grant(session, ticket, cost)
+                    if isinstance(granted, list):
+                        self.condition.notify_all()
+                        return granted
+                    if give_up_at is not None and time.monotonic() >= give_up_at:
+                        self.give_up(session, ticket, timeout)
+
+                delay = min(granted, 1.0) if granted else 0.01
+                await asyncio.sleep(delay if give_up_at is None else max(min(delay, give_up_at - time.monotonic()), 0))
+        except asyncio.CancelledError:
+            # Give up the place in the queue so the sessions behind are not blocked
+            with self.condition:
+                self.dequeue(session, ticket)
+                self.condition.notify_all()
+            raise
+
+    def release(self, entry, throttled=False, retry_after=None):
+        """Return a request slot, adapting the concurrency and pausing all sessions when the API throttled the request."""
+        with self.condition:
+            now = time.monotonic()
+            self.in_flight -= 1
+
+            # The API counted the request somewhere between sending and now, so it stays in the window until a minute after now
+            entry[0], entry[2] = now, True
+
+            if throttled:
+                # A rejected request does not count against the quota
+                self.window_tokens -= entry[1]
+                entry[1] = 0
+                self.throttled += 1
+                self.successes = 0
+
+                # Requests that were already in flight when the pause started count as one throttling event
+                if now >= self.paused_until:
+                    self.concurrency = max(self.min_concurrency, self.concurrency // 2)
+                self.paused_until = max(self.paused_until, now + (retry_after or 1.0))
+            else:
+                self.successes += 1
+                if self.successes >= self.concurrency and self.concurrency < self.max_concurrency:
+                    self.successes = 0
+                    self.concurrency += 1
+
+            self.condition.notify_all()
+
+    def stats(self):
+        with self.condition:
+            return {"concurrency": self.concurrency, "in_flight": self.in_flight, "throttled": self.throttled, "waiting": sum(len(queue) for queue in self.queues.values())}
+
+
+def retry_after_seconds(response):
+    """Return the delay requested by a throttled response's retry-after-ms or retry-after header, or None."""
+    headers = getattr(response, "headers", None) or {}
+
+    try:
+        if headers.get("retry-after-ms"):
+            return float(headers["retry-after-ms"]) / 1000
+        if headers.get("retry-after"):
+            return float(headers["retry-after"])
+    except ValueError:
+        # retry-after may also be an HTTP date
+        pass
+
+    return None
@@ -0,0 +1,90 @@
+import json
+import re
+
+
+class Route:
+    """A routing decision: a direct reply, or a single tool call whose output is turned into the final answer."""
+
+    __slots__ = ("rule", "reply", "tool", "tool_query", "answer")
+
+    def __init__(self, rule, reply=None, tool=None, tool_query=None, answer=None):
+        """
+        :param rule: Name of the rule that matched, recorded in the trace.
+        :param reply: Final answer given without calling a tool.
+        :param tool: Name of the tool to call.
+        :param tool_query: Input for the tool.
+        :param answer: Callable turning the tool output into the final answer.
+        """
+        self.rule = rule
+        self.reply = reply
+        self.tool = tool
+        self.tool_query = tool_query
+        self.answer = answer or (lambda result: result)
+
+
+def number(text):
+    return text.replace(",", "")
+
+
+class QueryRouter:
+    """Rule-based router that recognizes queries with an obvious answer or tool call, so the agent can skip the LLM for them.
+
+    Rules are tried in order. Each is a regular expression matched against the whole query and a handler taking the match
+    and returning a Route, or None to let the next rules try. Queries no rule routes go through the ReAct loop.
+    """
+
+    def __init__(self):
+        self.rules = []
+
+        polite = r"(?:\s+(?:there|again|everyone|agent|so much|a lot))?[\s!.,:)]*"
+        self.add_rule("greeting", rf"(?:hi|hello|hey|hiya|howdy|greetings|good (?:morning|afternoon|evening)){polite}", lambda match: Route("greeting", reply="Hello! How can I help you today?"))
+        self.add_rule("small_talk", rf"how are you(?: doing)?(?: today)?{polite}\??", lambda match: Route("small_talk", reply="I'm doing well, thanks for asking! How can I help you today?"))
+        self.add_rule("thanks", rf"(?:thanks|thank you|thx|cheers){polite}", lambda match: Route("thanks", reply="You're welcome! Let me know if there is anything else I can help with."))
+        self.add_rule("farewell", rf"(?:bye|goodbye|bye bye|see you(?: later| soon)?|good night){polite}", lambda match: Route("farewell", reply="Goodbye! Have a great day."))
+        self.add_rule("percentage", r"(?:what(?:'s| is)\s+)?(\d[\d,]*(?:\.\d+)?)\s*%\s+of\s+(\d[\d,]*(?:\.\d+)?)\s*\??", self.route_percentage)
+        self.add_rule("arithmetic", r"(?:what(?:'s| is)|(calculate|compute|evaluate)(?: step by step)?:?)?\s*([\d\s.,+\-*/%^()]+?)\s*(?:=\s*)?\??", self.route_arithmetic)
+        self.add_rule("weather", r"(?:what(?:'s| is)\s+)?(?:the\s+)?(?:current\s+)?weather\s+(?:like\s+)?(?:in|for|at)\s+([a-z][a-z .'&-]*?)(?:\s+(?:today|now|right now))?\s*\??", self.route_weather)
+
+    def add_rule(self, name, pattern, handler):
+        """Add a rule matching the whole query case-insensitively; handler(match) returns a Route or None."""
+        self.rules.append((name, re.compile(pattern, re.IGNORECASE), handler))
+
+    def route(self, query):
+        """Return the Route of the first rule that handles the query, or None."""
+        query = " ".join(query.split())
+
+        for _, pattern, handler in self.rules:
+            match = pattern.fullmatch(query)
+            route = handler(match) if match else None
+            if route:
+                return route
+
+        return None
+
+    @staticmethod
+    def route_percentage(match):
+        percent, amount = number(match.group(1)), number(match.group(2))
+        return Route("percentage", tool="calculator", tool_query=f"{percent} / 100 * {amount}", answer=lambda result: f"{percent}% of {amount} is {result}.")
+
+    @staticmethod
+    def route_arithmetic(match):
+        verb, expression = match.group(1), match.group(2).strip()
+
+        # A bare number or a comma separated list is not a calculation
+        if "," in expression or not re.search(r"[\d)]\s*(?:[-+*/%^]|\*\*)\s*[-+(]?\s*[\d(]", expression):
+            return None
+
+        # "What is 9/11?", "24/7", "7-11", dates like 12/25/2024 or 2024-12-25 and ranges like 1.5-2.5 name things more often than they ask for a division or subtraction
+        if not verb and re.fullmatch(r"\d+(?:\.\d+)?(?:[/-]\d+(?:\.\d+)?)+", expression):
+            return None
+
+        return Route("arithmetic", tool="calculator", tool_query=expression, answer=lambda result: f"{expression} = {result}")
+
+    @staticmethod
+    def route_weather(match):
+        cities = [city.strip(" .") for city in re.split(r"\s+(?:and|&)\s+", match.group(1), flags=re.IGNORECASE)]
+        if not all(cities):
+            return None
+
+        # Several cities are looked up concurrently in one call
+        return Route("weather", tool="weather", tool_query=cities[0] if len(cities) == 1 else json.dumps(cities))
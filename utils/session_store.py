@@ -0,0 +1,152 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+
+
+class SqliteSessionStore:
+    """Keeps conversation histories in an SQLite database, writing each message as it is added."""
+
+    def __init__(self, path):
+        self.lock = threading.Lock()
+        self.db = sqlite3.connect(path, timeout=5, check_same_thread=False)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("CREATE TABLE IF NOT EXISTS messages (id INTEGER PRIMARY KEY AUTOINCREMENT, session_id TEXT, role TEXT, content TEXT, tokens INTEGER)")
+        self.db.execute("CREATE INDEX IF NOT EXISTS messages_session ON messages (session_id, id)")
+        self.db.execute("CREATE TABLE IF NOT EXISTS sessions (session_id TEXT PRIMARY KEY, summary TEXT, updated_at REAL)")
+        self.db.commit()
+
+    def load(self, session_id, limit):
+        """Return (summary, [(message_id, role, content, tokens), ...]) with at most the limit most recent messages."""
+        with self.lock:
+            row = self.db.execute("SELECT summary FROM sessions WHERE session_id = ?", (session_id,)).fetchone()
+            rows = self.db.execute("SELECT id, role, content, tokens FROM messages WHERE session_id = ? ORDER BY id DESC LIMIT ?", (session_id, limit)).fetchall()
+
+        return (row[0] if row else ""), rows[::-1]
+
+    def append(self, session_id, role, content, tokens):
+        """Store a message and return its id."""
+        with self.lock:
+            cursor = self.db.execute("INSERT INTO messages (session_id, role, content, tokens) VALUES (?, ?, ?, ?)", (session_id, role, content, tokens))
+            self.db.commit()
+            return cursor.lastrowid
+
+    def delete(self, session_id, message_ids):
+        """Remove messages, e.g. once they have been summarized."""
+        with self.lock:
+            self.db.executemany("DELETE FROM messages WHERE session_id = ? AND id = ?", [(session_id, message_id) for message_id in message_ids])
+            self.db.commit()
+
+    def set_summary(self, session_id, summary):
+        with self.lock:
+            self.db.execute("INSERT OR REPLACE INTO sessions (session_id, summary, updated_at) VALUES (?, ?, ?)", (session_id, summary, time.time()))
+            self.db.commit()
+
+    def forget(self, session_id):
+        """Nothing is kept in memory per session, SQLite assigns the message IDs."""
+
+
+class LogSessionStore:
+    """Keeps each conversation history in an append-only JSONL log, one file per session, compacted when it is loaded."""
+
+    def __init__(self, directory):
+        self.directory = directory
+        self.lock = threading.Lock()
+        self.next_ids = {}
+        os.makedirs(directory, exist_ok=True)
+
+    def path(self, session_id):
+        # Hash the ID so any session ID makes a safe file name
+        return os.path.join(self.directory, hashlib.sha1(session_id.encode()).hexdigest() + ".jsonl")
+
+    def write(self, session_id, record):
+        """Append a record to the session's log. Caller must hold the lock."""
+        with open(self.path(session_id), "a") as file:
+            file.write(json.dumps(record) + "\n")
+
+    def replay(self, session_id):
+        """Return (summary, {message_id: (role, content, tokens)}, records) from the session's log. Caller must hold the lock."""
+        summary, messages, records, last_id = "", {}, 0, 0
+
+        if os.path.exists(self.path(session_id)):
+            with open(self.path(session_id), "r") as file:
+                for line in file:
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        # A partially written last line from an interrupted process
+                        continue
+
+                    records += 1
+                    if record["op"] == "append":
+                        messages[record["id"]] = (record["role"], record["content"], record["tokens"])
+                        last_id = max(last_id, record["id"])
+                    elif record["op"] == "delete":
+                        for message_id in record["ids"]:
+                            messages.pop(message_id, None)
+                    elif record["op"] == "summary":
+                        summary = record["summary"]
+
+        # Deleted messages keep their IDs, so a new message never reuses one a later delete record could remove
+        self.next_ids[session_id] = last_id + 1
+        return summary, messages, records
+
+    def compact(self, session_id, summary, messages):
+        """Rewrite the log with only the live records. Caller must hold the lock."""
+        path = self.path(session_id)
+        with open(path + ".tmp", "w") as file:
+            if summary:
+                file.write(json.dumps({"op": "summary", "summary": summary}) + "\n")
+            for message_id, (role, content, tokens) in messages.items():
+                file.write(json.dumps({"op": "append", "id": message_id, "role": role, "content": content, "tokens": tokens}) + "\n")
+
+        os.replace(path + ".tmp", path)
+
+    def load(self, session_id, limit):
+        """Return (summary, [(message_id, role, content, tokens), ...]) with at most the limit most recent messages."""
+        with self.lock:
+            summary, messages, records = self.replay(session_id)
+
+            # Deleted messages and old summaries make up most of a long-lived log
+            if records > 2 * (len(messages) + 1):
+                self.compact(session_id, summary, messages)
+
+        rows = [(message_id, role, content, tokens) for message_id, (role, content, tokens) in messages.items()]
+        return summary, rows[-limit:] if limit else []
+
+    def append(self, session_id, role, content, tokens):
+        """Store a message and return its id."""
+        with self.lock:
+            if session_id not in self.next_ids:
+                self.replay(session_id)
+
+            message_id = self.next_ids[session_id]
+            self.next_ids[session_id] = message_id + 1
+            self.write(session_id, {"op": "append", "id": message_id, "role": role, "content": content, "tokens": tokens})
+            return message_id
+
+    def delete(self, session_id, message_ids):
+        """Remove messages, e.g. once they have been summarized."""
+        with self.lock:
+            self.write(session_id, {"op": "delete", "ids": list(message_ids)})
+
+    def set_summary(self, session_id, summary):
+        with self.lock:
+            self.write(session_id, {"op": "summary", "summary": summary})
+
+    def forget(self, session_id):
+        """Drop what is kept in memory for a session evicted by the agent, its next message ID is read back from the log when it returns."""
+        with self.lock:
+            self.next_ids.pop(session_id, None)
+
+
+def open_session_store(location):
+    """Return the session store for a location: an SQLite database for a .db/.sqlite path, otherwise a directory of session logs. None disables persistence."""
+    if not location:
+        return None
+    if location.endswith((".db", ".sqlite", ".sqlite3")):
+        return SqliteSessionStore(location)
+
+    return LogSessionStore(location)
@@ -0,0 +1,11 @@
+import math
+
+
+def percentile(values, fraction):
+    """Nearest-rank percentile, 0.0 for an empty list."""
+    if not values:
+        return 0.0
+
+    ordered = sorted(values)
+    # The smallest value with at least fraction of the values at or below it
+    return ordered[min(len(ordered) - 1, max(0, math.ceil(fraction * len(ordered)) - 1))]
@@ -0,0 +1,8 @@
+import re
+
+STOPWORDS = set("a an and are at be can could current currently do does for from how i in is it like me my now of on please right s show tell that the this to what whats which who will would you".split())
+
+
+def terms(text):
+    """Return the lowercase content words of a text, without stopwords."""
+    return {word for word in re.findall(r"\w+", text.lower()) if word not in STOPWORDS}
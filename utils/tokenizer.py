@@ -0,0 +1,5 @@
+class ApproximateTokenizer:
+    """Offline stand-in for a tiktoken encoding that estimates about four characters per token."""
+
+    def encode(self, text):
+        return [0] * ((len(text) + 3) // 4)
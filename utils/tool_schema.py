@@ -0,0 +1,69 @@
+import json
+
+# Parameters of a tool that takes a single free-text input
+QUERY_PARAMETERS = {
+    "type": "object",
+    "properties": {"query": {"type": "string", "minLength": 1, "description": "The input for the tool."}},
+    "required": ["query"],
+    "additionalProperties": False,
+}
+
+JSON_TYPES = {"object": dict, "array": list, "string": str, "integer": int, "number": (int, float), "boolean": bool, "null": type(None)}
+
+
+def validate(value, schema, path="arguments"):
+    """Return the problems of a value against the subset of JSON Schema used by tool definitions, an empty list if it is valid."""
+    expected = schema.get("type")
+    types = JSON_TYPES.get(expected)
+
+    # bool is an int in Python but not a number in JSON
+    if types and (not isinstance(value, types) or (isinstance(value, bool) and expected != "boolean")):
+        return [f"{path} must be of type {expected}"]
+
+    if "enum" in schema and value not in schema["enum"]:
+        return [f"{path} must be one of {schema['enum']}"]
+
+    problems = []
+
+    if isinstance(value, dict):
+        properties = schema.get("properties", {})
+        problems += [f"{path}.{name} is required" for name in schema.get("required", []) if name not in value]
+        if schema.get("additionalProperties") is False:
+            problems += [f"{path}.{name} is not a known parameter" for name in value if name not in properties]
+        if len(value) < schema.get("minProperties", 0):
+            problems.append(f"{path} needs one of {', '.join(properties)}")
+        if "maxProperties" in schema and len(value) > schema["maxProperties"]:
+            problems.append(f"{path} takes only one of {', '.join(properties)}")
+        for name, item in value.items():
+            if name in properties:
+                problems += validate(item, properties[name], f"{path}.{name}")
+
+    if isinstance(value, list):
+        if len(value) < schema.get("minItems", 0):
+            problems.append(f"{path} needs at least {schema['minItems']} item{'s' if schema['minItems'] != 1 else ''}")
+        if "maxItems" in schema and len(value) > schema["maxItems"]:
+            problems.append(f"{path} takes at most {schema['maxItems']} items")
+        for index, item in enumerate(value):
+            problems += validate(item, schema.get("items", {}), f"{path}[{index}]")
+
+    if isinstance(value, str) and len(value.strip()) < schema.get("minLength", 0):
+        problems.append(f"{path} cannot be empty")
+
+    return problems
+
+
+def tool_input(arguments):
+    """Turn validated call arguments into the tool's text input, the same text an Action line would carry so both modes share the tool cache.
+
+    A single text argument becomes that text, a single list argument its only item or the list as JSON, anything else the arguments as JSON.
+    """
+    if len(arguments) == 1:
+        value = next(iter(arguments.values()))
+        if isinstance(value, list) and len(value) == 1:
+            value = value[0]
+        if isinstance(value, str):
+            return " ".join(value.split())
+        if isinstance(value, list):
+            return json.dumps(value, ensure_ascii=False)
+
+    return json.dumps(arguments, ensure_ascii=False)
@@ -0,0 +1,161 @@
+import bisect
+import contextvars
+import json
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+class Span:
+    """A timed step of the agent loop, such as a query, an iteration, an LLM call or a tool call."""
+
+    __slots__ = ("name", "span_id", "trace_id", "parent_id", "start", "end", "attributes", "error")
+
+    def __init__(self, name, parent=None, **attributes):
+        self.name = name
+        self.span_id = uuid.uuid4().hex[:16]
+        self.trace_id = parent.trace_id if parent else self.span_id
+        self.parent_id = parent.span_id if parent else None
+        self.start = time.time()
+        self.end = None
+        self.attributes = attributes
+        self.error = None
+
+    @property
+    def duration(self):
+        return (self.end or time.time()) - self.start
+
+    def set(self, **attributes):
+        self.attributes.update(attributes)
+
+    def to_dict(self):
+        return {
+            "name": self.name,
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "start": self.start,
+            "duration": self.duration,
+            "attributes": self.attributes,
+            "error": self.error,
+        }
+
+
+class JsonlSink:
+    """Appends every finished span as one JSON line to a file."""
+
+    def __init__(self, path):
+        self.path = path
+        self.lock = threading.Lock()
+
+    def __call__(self, span):
+        line = json.dumps(span.to_dict(), default=str)
+        with self.lock, open(self.path, "a") as file:
+            file.write(line + "\n")
+
+
+class MetricsRegistry:
+    """In-process counters and histograms that can be read as a dict or scraped in the Prometheus text format."""
+
+    def __init__(self, buckets=DURATION_BUCKETS):
+        self.buckets = buckets
+        self.counters = {}
+        self.histograms = {}
+        self.lock = threading.Lock()
+
+    def increment(self, name, value=1):
+        with self.lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    def observe(self, name, value):
+        with self.lock:
+            histogram = self.histograms.setdefault(name, {"buckets": [0] * len(self.buckets), "sum": 0.0, "count": 0})
+            index = bisect.bisect_left(self.buckets, value)
+            if index < len(self.buckets):
+                histogram["buckets"][index] += 1
+            histogram["sum"] += value
+            histogram["count"] += 1
+
+    def snapshot(self):
+        """Return a copy of every counter and histogram."""
+        with self.lock:
+            return {"counters": dict(self.counters), "histograms": {name: {"buckets": list(h["buckets"]), "sum": h["sum"], "count": h["count"]} for name, h in self.histograms.items()}}
+
+    def render(self):
+        """Render the metrics in the Prometheus text exposition format."""
+        snapshot = self.snapshot()
+        lines = []
+
+        for name, value in sorted(snapshot["counters"].items()):
+            lines += [f"# TYPE {name} counter", f"{name} {value}"]
+
+        for name, histogram in sorted(snapshot["histograms"].items()):
+            lines.append(f"# TYPE {name} histogram")
+            cumulative = 0
+            for bound, count in zip(self.buckets, histogram["buckets"]):
+                cumulative += count
+                lines.append(f'{name}_bucket{{le="{bound}"}} {cumulative}')
+            lines += [f'{name}_bucket{{le="+Inf"}} {histogram["count"]}', f"{name}_sum {histogram['sum']}", f"{name}_count {histogram['count']}"]
+
+        return "\n".join(lines) + "\n"
+
+    def serve(self, port, host="127.0.0.1"):
+        """Expose the metrics on http://host:port/metrics from a background thread."""
+        registry = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                body = registry.render().encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        server = ThreadingHTTPServer((host, port), Handler)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        return server
+
+
+class Tracer:
+    """Creates nested spans, tracking the current span per thread and asyncio task, and reports finished spans to the sinks and metrics."""
+
+    def __init__(self, metrics=None, sinks=None):
+        self.metrics = metrics or MetricsRegistry()
+        self.sinks = sinks or []
+        self.current_span = contextvars.ContextVar("current_span", default=None)
+
+    def current(self):
+        return self.current_span.get()
+
+    @contextmanager
+    def span(self, name, **attributes):
+        """Time a block as a child of the current span; exceptions are recorded on the span and re-raised."""
+        span = Span(name, self.current_span.get(), **attributes)
+        token = self.current_span.set(span)
+
+        try:
+            yield span
+        except BaseException as e:
+            span.error = f"{type(e).__name__}: {e}"
+            raise
+        finally:
+            self.current_span.reset(token)
+            span.end = time.time()
+            self.finish(span)
+
+    def finish(self, span):
+        self.metrics.increment(f"{span.name}_total")
+        self.metrics.observe(f"{span.name}_duration_seconds", span.duration)
+        if span.error:
+            self.metrics.increment(f"{span.name}_errors_total")
+
+        for sink in self.sinks:
+            sink(span)
@@ -0,0 +1,227 @@
+import argparse
+import bz2
+import difflib
+import gzip
+import json
+import mmap
+import os
+import re
+import time
+import unicodedata
+import xml.etree.ElementTree as ElementTree
+from array import array
+
+
+def normalize_title(title):
+    """Fold case, accents, underscores and punctuation so that "Julián_Álvarez" and "julian alvarez" share a key."""
+    decomposed = unicodedata.normalize("NFKD", title)
+    stripped = "".join(char for char in decomposed if not unicodedata.combining(char))
+    return " ".join(re.sub(r"[\W_]+", " ", stripped.lower()).split())
+
+
+def open_dump(path):
+    if path.endswith(".gz"):
+        return gzip.open(path, "rb")
+    if path.endswith(".bz2"):
+        return bz2.open(path, "rb")
+    return open(path, "rb")
+
+
+def read_abstracts(path):
+    """Yield (title, abstract) pairs from a Wikipedia abstracts dump such as enwiki-latest-abstract.xml.gz."""
+    with open_dump(path) as file:
+        for _, element in ElementTree.iterparse(file):
+            if element.tag != "doc":
+                continue
+
+            title = re.sub(r"^Wikipedia: ", "", element.findtext("title") or "").strip()
+            abstract = (element.findtext("abstract") or "").strip()
+            if title and abstract:
+                yield title, abstract
+
+            # Keep memory flat while streaming a multi-gigabyte dump
+            element.clear()
+
+
+def read_redirects(path):
+    """Yield (source, target) title pairs from a tab separated redirects file."""
+    with open(path, "r", encoding="utf-8") as file:
+        for line in file:
+            parts = line.rstrip("\n").split("\t")
+            if len(parts) == 2:
+                yield parts[0], parts[1]
+
+
+def build_index(dump_path, index_dir, redirects_path=None):
+    """Build the index files in index_dir from an abstracts dump and an optional redirects file, returning the index metadata.
+
+    summaries.bin holds the UTF-8 summaries back to back. keys.bin holds one "key\\ttitle\\toffset\\tlength\\n" record per
+    normalized title, sorted by key, and offsets.bin the start of each record, so lookups can binary search the mapped files.
+    Redirects are resolved here and point straight at their target's summary.
+    """
+    os.makedirs(index_dir, exist_ok=True)
+    entries = {}
+
+    with open(os.path.join(index_dir, "summaries.bin"), "wb") as summaries:
+        for title, abstract in read_abstracts(dump_path):
+            key = normalize_title(title)
+            if key in entries:
+                continue
+
+            data = abstract.encode("utf-8")
+            entries[key] = (title, summaries.tell(), len(data))
+            summaries.write(data)
+
+    articles = len(entries)
+    if redirects_path:
+        for source, target in read_redirects(redirects_path):
+            source_key, target_entry = normalize_title(source), entries.get(normalize_title(target))
+            if target_entry and source_key not in entries:
+                entries[source_key] = target_entry
+
+    offsets = array("Q")
+    with open(os.path.join(index_dir, "keys.bin"), "wb") as keys:
+        for key in sorted(entries, key=lambda key: key.encode("utf-8")):
+            title, offset, length = entries[key]
+            offsets.append(keys.tell())
+            keys.write(f"{key}\t{title}\t{offset}\t{length}\n".encode("utf-8"))
+
+    with open(os.path.join(index_dir, "offsets.bin"), "wb") as file:
+        offsets.tofile(file)
+
+    meta = {"articles": articles, "redirects": len(entries) - articles, "source": os.path.basename(dump_path), "built_at": time.time()}
+    with open(os.path.join(index_dir, "meta.json"), "w") as file:
+        json.dump(meta, file)
+
+    return meta
+
+
+class WikiIndex:
+    """Read-only view of an index built by build_index, memory-mapped so a lookup reads only the pages it touches."""
+
+    def __init__(self, index_dir, fuzzy_cutoff=0.85, fuzzy_window=32):
+        """
+        :param index_dir: Directory written by build_index.
+        :param fuzzy_cutoff: Minimum similarity of a misspelled title to its match.
+        :param fuzzy_window: Number of neighbouring keys on each side compared for a fuzzy match.
+        """
+        if not os.path.exists(os.path.join(index_dir, "meta.json")):
+            raise ValueError(f"No Wikipedia index in '{index_dir}', build one with: python -m utils.wiki_index build <abstracts dump> {index_dir}")
+
+        self.fuzzy_cutoff = fuzzy_cutoff
+        self.fuzzy_window = fuzzy_window
+        self.files = [open(os.path.join(index_dir, name), "rb") for name in ("keys.bin", "offsets.bin", "summaries.bin")]
+        self.keys, offsets, self.summaries = [mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) if os.path.getsize(file.name) else b"" for file in self.files]
+        self.offsets = memoryview(offsets).cast("Q")
+
+    def __len__(self):
+        return len(self.offsets)
+
+    def key_at(self, position):
+        start = self.offsets[position]
+        return self.keys[start : self.keys.find(b"\t", start)]
+
+    def entry_at(self, position):
+        """Return (title, summary) of the record at a position, the summary decoded straight from the mapped file."""
+        start = self.offsets[position]
+        _, title, offset, length = self.keys[start : self.keys.find(b"\n", start)].split(b"\t")
+        offset, length = int(offset), int(length)
+
+        return title.decode("utf-8"), str(memoryview(self.summaries)[offset : offset + length], "utf-8")
+
+    def bisect(self, key):
+        """Return the position of the first record whose key is not less than key."""
+        low, high = 0, len(self)
+        while low < high:
+            middle = (low + high) // 2
+            if self.key_at(middle) < key:
+                low = middle + 1
+            else:
+                high = middle
+
+        return low
+
+    def prefix_positions(self, prefix, limit):
+        position = self.bisect(prefix)
+        while position < len(self) and limit > 0 and self.key_at(position).startswith(prefix):
+            yield position
+            position += 1
+            limit -= 1
+
+    def titles(self, prefix, limit=10):
+        """Return up to limit titles whose normalized form starts with prefix, e.g. for suggestions."""
+        return [self.entry_at(position)[0] for position in self.prefix_positions(normalize_title(prefix).encode("utf-8"), limit)]
+
+    def lookup(self, query, exact=False):
+        """Return (title, summary) for the best matching title: exact, then the shortest title extending the query, then the closest spelling. None if nothing matches.
+
+        exact only accepts a title or redirect with the same normalized form.
+        """
+        key = normalize_title(query).encode("utf-8")
+        if not key or not len(self):
+            return None
+
+        position = self.bisect(key)
+        if position < len(self) and self.key_at(position) == key:
+            return self.entry_at(position)
+        if exact:
+            return None
+
+        # "albert einst" -> "albert einstein"
+        extensions = list(self.prefix_positions(key + b" ", 20)) or list(self.prefix_positions(key, 20))
+        if extensions:
+            return self.entry_at(min(extensions, key=lambda candidate: len(self.key_at(candidate))))
+
+        # A misspelling usually sorts close to the title it was meant to be
+        matcher = difflib.SequenceMatcher(b=key)
+        best, best_score = None, self.fuzzy_cutoff
+        for candidate in range(max(position - self.fuzzy_window, 0), min(position + self.fuzzy_window, len(self))):
+            matcher.set_seq1(self.key_at(candidate))
+            # The quick upper bounds skip most candidates without the full comparison
+            if matcher.real_quick_ratio() >= best_score and matcher.quick_ratio() >= best_score and matcher.ratio() >= best_score:
+                best, best_score = candidate, matcher.ratio()
+
+        return self.entry_at(best) if best is not None else None
+
+    def close(self):
+        self.offsets.release()
+        for mapped in (self.keys, self.summaries):
+            if isinstance(mapped, mmap.mmap):
+                mapped.close()
+        for file in self.files:
+            file.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build or query the offline Wikipedia summary index.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    build = subparsers.add_parser("build", help="Build an index from an abstracts dump, e.g. enwiki-latest-abstract.xml.gz.")
+    build.add_argument("dump", help="Abstracts dump, plain, .gz or .bz2.")
+    build.add_argument("index_dir", help="Directory the index is written to.")
+    build.add_argument("--redirects", help="Tab separated file of 'source title<TAB>target title' lines.")
+
+    lookup = subparsers.add_parser("lookup", help="Look up titles in a built index.")
+    lookup.add_argument("index_dir")
+    lookup.add_argument("queries", nargs="+")
+
+    args = parser.parse_args()
+
+    if args.command == "build":
+        started_at = time.perf_counter()
+        meta = build_index(args.dump, args.index_dir, args.redirects)
+        print(f"Indexed {meta['articles']} articles and {meta['redirects']} redirects in {time.perf_counter() - started_at:.1f}s")
+        return
+
+    index = WikiIndex(args.index_dir)
+    for query in args.queries:
+        started_at = time.perf_counter()
+        match = index.lookup(query)
+        elapsed = (time.perf_counter() - started_at) * 1000
+        print(f"{query!r} -> {match[0] if match else None} ({elapsed:.3f} ms)")
+        if match:
+            print(f"  {match[1][:200]}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,12 +1,25 @@
 import re
+import uuid
+
 import streamlit as st
 
 from agent import ReActAgent
 
 
+@st.cache_resource
+def get_shared_agent():
+    """Creates the agent once per process; its client, tokenizer, tools and caches are shared by all sessions."""
+    return ReActAgent()
+
+
 class WebApp:
     def __init__(self):
-        self.agent = ReActAgent()
+        # Each browser session keeps its own conversation across reruns, the ID in the URL lets it resume after a restart
+        if "session" not in st.query_params:
+            st.query_params["session"] = uuid.uuid4().hex
+
+        self.agent = get_shared_agent().get_session(st.query_params["session"])
+        self.agent.stream = True
         self.initialize_ui()
 
     def initialize_ui(self):
@@ -102,57 +115,54 @@ class WebApp:
         """
         st.markdown(styled_content, unsafe_allow_html=True)
 
-    def process_messages(self, messages):
-        """Processes messages, classifying them into sidebar or main chat."""
-        sidebar_messages = []
-        main_messages = []
-        final_answer = None
-
-        for message in messages:
-            role = message["role"]
-            content = message["content"]
-
-            # Extract final answer if present
-            if "Final Answer:" in content:
-                final_answer = content.split("Final Answer:", 1)[-1].strip()
-                final_answer = re.sub(r"\\\((.*?)\\\)", r"\1", final_answer)
-
-            # Sidebar messages (Chain of Thought)
-            if "Thought:" in content or "Action:" in content or "PAUSE" in content or "Observation:" in content or "Final Answer:" in content:
-                formatted_content = content.replace("Thought:", "\n:green[**Thought**]:").replace("Action:", "\n:blue[**Action**]:").replace("PAUSE", "\n:orange[**PAUSE**]").replace("Observation:", "\n:violet[**Observation**]:").replace("Final Answer:", "\n:red[**Final Answer**]:")
-                sidebar_messages.append(formatted_content)
-            elif content:
-                main_messages.append({"role": role, "content": content})
-
-        # Check if final answer is present and no main messages are present
-        if final_answer and not main_messages:
-            main_messages.append({"role": "assistant", "content": final_answer})
-
-        return sidebar_messages, main_messages
+    def handle_event(self, event):
+        """Renders agent events as they arrive: live tokens and reasoning steps in the sidebar, the final answer in the main chat."""
+        if event.type == "token":
+            self.streamed_text += event.content
+            self.live_response.markdown(self.streamed_text)
+            return
+
+        # A completed step replaces the live token preview
+        self.streamed_text = ""
+        self.live_response.empty()
+
+        if event.type == "final_answer":
+            self.final_answer = re.sub(r"\\\((.*?)\\\)", r"\1", event.content)
+            if not event.data.get("reasoning"):
+                return
+
+        labels = {
+            "thought": ":green[**Thought**]:",
+            "action": ":blue[**Action**]:",
+            "observation": ":violet[**Observation**]:",
+            "final_answer": ":red[**Final Answer**]:",
+        }
+        if event.type in labels:
+            content = re.sub(r"^Observation:\s*", "", event.content)
+            with st.sidebar:
+                st.markdown(f"{labels[event.type]} {content}")
+                if event.type == "action":
+                    st.markdown(":orange[**PAUSE**]")
+                self.live_response = st.empty()
 
     def handle_user_input(self):
-        """Handles user input and processes responses."""
+        """Handles user input and renders the agent's events while it works."""
         if user_input := st.chat_input("How can I help?"):
             st.session_state.chat_history.append({"role": "user", "content": user_input})
             self.display_message("user", user_input)
 
+            with st.sidebar:
+                self.live_response = st.empty()
+            self.streamed_text = ""
+            self.final_answer = None
+
             # Get response from the agent
             try:
-                result_messages = self.agent.execute(user_input)
-                response_data = [{"role": msg.role, "content": msg.content} for msg in result_messages]
-
-                # Process messages into sidebar and main chat
-                sidebar_messages, main_messages = self.process_messages(response_data)
-
-                # Display sidebar messages
-                with st.sidebar:
-                    for sidebar_msg in sidebar_messages:
-                        st.markdown(sidebar_msg)
+                self.agent.execute(user_input, on_event=self.handle_event)
 
-                # Display main chat messages
-                for msg in main_messages:
-                    st.session_state.chat_history.append(msg)
-                    self.display_message(msg["role"], msg["content"])
+                if self.final_answer:
+                    st.session_state.chat_history.append({"role": "assistant", "content": self.final_answer})
+                    self.display_message("assistant", self.final_answer)
 
             except Exception as e:
                 st.error(f"An error occurred: {e}")